@@ -0,0 +1,294 @@
+"""Offline scraper benchmarks against recorded product pages.
+
+Serves the pages in bench/fixtures/ through a fake fetch layer (no network)
+and times the public scraper functions from scraper.py:
+
+    python bench/bench_scrapers.py                    # html + json paths, 200 iterations
+    python bench/bench_scrapers.py --mode html -n 500
+    python bench/bench_scrapers.py --mode html --parse-pool  # include the parse pool round trip
+    python bench/bench_scrapers.py --json before.json
+    python bench/bench_scrapers.py --compare before.json
+    python bench/bench_scrapers.py --update-expected  # after an intended output change
+    python bench/bench_scrapers.py --record URL NAME  # add a live page to the corpus
+
+Every call's result is checked against bench/fixtures/expected.json, so a
+faster parser that returns different data fails loudly instead of "winning".
+"""
+import os
+import sys
+import gc
+import gzip
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+MANIFEST_FILE = os.path.join(FIXTURES_DIR, "manifest.json")
+EXPECTED_FILE = os.path.join(FIXTURES_DIR, "expected.json")
+
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import scraper  # noqa: E402
+import fetcher  # noqa: E402
+
+# Functions under test, per site
+TARGETS = {
+    "vaporhatch": [
+        "get_vaporhatch_in_stock_flavors",
+        "get_vaporhatch_price",
+        "get_product_name_from_url",
+    ],
+    "drsmoke": [
+        "get_drsmoke_in_stock_flavors",
+        "get_drsmoke_price",
+        "get_drsmoke_inventory_count",
+        "get_product_name_from_url",
+    ],
+}
+
+# ==========================
+# FIXTURES
+# ==========================
+
+def read_fixture(filename):
+    """Read a fixture file, transparently un-gzipping large pages"""
+    path = os.path.join(FIXTURES_DIR, filename)
+    if filename.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return f.read()
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def load_corpus():
+    """Return the manifest entries with their page bodies loaded"""
+    with open(MANIFEST_FILE, "r") as f:
+        manifest = json.load(f)
+    for entry in manifest:
+        entry["html_body"] = read_fixture(entry["html"])
+        entry["json_body"] = read_fixture(entry["json"]) if entry.get("json") else None
+    return manifest
+
+def install_fake_fetch(corpus):
+    """Route fetcher.fetch / fetch_raw / fetch_json / fetch_json_page to the corpus instead of the network"""
+    pages = {}
+    for entry in corpus:
+        pages[entry["url"]] = entry["html_body"]
+        if entry["json_body"] is not None:
+            pages[scraper.get_shopify_json_url(entry["url"])] = entry["json_body"]
+
+    async def fake_fetch(url, timeout=None, conditional=False, fragment=None):
+        return pages[url]
+
+    bodies = {url: text.encode("utf-8") for url, text in pages.items()}
+
+    async def fake_fetch_raw(url, timeout=None, conditional=False):
+        # No stored digest, so every call does the full decode + extract + parse
+        fetcher.forget(url)
+        return fetcher.RawPage(url, 200, bodies[url], "utf-8", None, None)
+
+    async def fake_fetch_json(url, timeout=None):
+        if url not in pages:
+            raise ValueError(f"no JSON fixture for {url}")
+        return json.loads(pages[url])
+
+    async def fake_fetch_json_page(url, timeout=None, conditional=False):
+        data = await fake_fetch_json(url)
+        return fetcher.RawPage(url, 200, bodies[url], "utf-8", None, None), None, data
+
+    fetcher.fetch = fake_fetch
+    fetcher.fetch_raw = fake_fetch_raw
+    fetcher.fetch_json = fake_fetch_json
+    fetcher.fetch_json_page = fake_fetch_json_page
+
+def configure_mode(mode, parse_pool=False):
+    """Select the HTML or Shopify JSON extraction path and disable result caching"""
+    scraper.SHOPIFY_JSON_FIRST = mode == "json"
+    # Time the parsers themselves unless the pool round trip is what's being measured
+    scraper.PARSE_WORKERS = scraper.PARSE_WORKERS if parse_pool else 0
+    # Every call must do the full fetch + parse
+    scraper.SNAPSHOT_TTL = 0
+    scraper.SNAPSHOT_CACHE.clear()
+    scraper.SNAPSHOT_MEMO.clear()
+
+def normalize(result):
+    """Make a scraper result JSON comparable"""
+    if isinstance(result, (set, frozenset)):
+        return sorted(result)
+    return result
+
+# ==========================
+# MEASUREMENT
+# ==========================
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+async def measure(func, url, iterations):
+    """Time ``iterations`` calls and return (result, stats)"""
+    result = await func(url)
+
+    samples = []
+    gc.collect()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func(url)
+        samples.append(time.perf_counter() - start)
+
+    # Separate pass for memory, tracemalloc slows the calls down a lot
+    gc.collect()
+    tracemalloc.start()
+    await func(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(samples)
+    return result, {
+        "pages_per_sec": iterations / total if total else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "peak_kb": peak / 1024,
+    }
+
+async def run_benchmarks(corpus, modes, iterations, only=None, parse_pool=False):
+    """Benchmark every target on every fixture; returns (report, results)"""
+    report = {}
+    results = {}
+    for mode in modes:
+        configure_mode(mode, parse_pool)
+        for entry in corpus:
+            if only and only not in entry["name"]:
+                continue
+            for target in TARGETS[entry["site"]]:
+                key = f"{mode}:{entry['name']}:{target}"
+                result, stats = await measure(getattr(scraper, target), entry["url"], iterations)
+                report[key] = stats
+                results[key] = normalize(result)
+    return report, results
+
+# ==========================
+# REPORTING
+# ==========================
+
+def check_expected(results):
+    """Compare results with expected.json; returns a list of mismatch descriptions"""
+    if not os.path.exists(EXPECTED_FILE):
+        return []
+    with open(EXPECTED_FILE, "r") as f:
+        expected = json.load(f)
+    mismatches = []
+    for key, value in results.items():
+        if key in expected and expected[key] != value:
+            mismatches.append(f"{key}: expected {expected[key]!r}, got {value!r}")
+    return mismatches
+
+def print_report(report, baseline=None):
+    header = f"{'benchmark':<72} {'pages/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak KB':>9}"
+    if baseline:
+        header += f" {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for key, stats in report.items():
+        line = (
+            f"{key:<72} {stats['pages_per_sec']:>9.1f} {stats['p50_ms']:>8.2f} "
+            f"{stats['p99_ms']:>8.2f} {stats['peak_kb']:>9.0f}"
+        )
+        if baseline and key in baseline:
+            before = baseline[key]["p50_ms"]
+            line += f" {before / stats['p50_ms']:>7.2f}x" if stats["p50_ms"] else f" {'-':>8}"
+        print(line)
+
+def record_page(url, name):
+    """Download a live product page (and its Shopify JSON) into the corpus"""
+    headers = {"User-Agent": fetcher.HEADERS["User-Agent"]}
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as r:
+        html = r.read().decode("utf-8", "replace")
+    html_file = f"{name}.html.gz" if len(html) > 200_000 else f"{name}.html"
+    if html_file.endswith(".gz"):
+        with gzip.open(os.path.join(FIXTURES_DIR, html_file), "wt", encoding="utf-8") as f:
+            f.write(html)
+    else:
+        with open(os.path.join(FIXTURES_DIR, html_file), "w", encoding="utf-8") as f:
+            f.write(html)
+
+    json_file = None
+    json_url = scraper.get_shopify_json_url(url)
+    if json_url:
+        try:
+            with urllib.request.urlopen(urllib.request.Request(json_url, headers=headers), timeout=30) as r:
+                json_file = f"{name}.js"
+                with open(os.path.join(FIXTURES_DIR, json_file), "w", encoding="utf-8") as f:
+                    f.write(r.read().decode("utf-8", "replace"))
+        except Exception as e:
+            print(f"No JSON recorded for {url}: {e}")
+
+    with open(MANIFEST_FILE, "r") as f:
+        manifest = [m for m in json.load(f) if m["name"] != name]
+    manifest.append({
+        "name": name,
+        "site": scraper.detect_site_from_url(url),
+        "kind": "recorded",
+        "url": url,
+        "html": html_file,
+        "json": json_file,
+    })
+    with open(MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"Recorded {name} ({len(html)} bytes). Run with --update-expected to accept its output.")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks")
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--mode", choices=["html", "json", "both"], default="both")
+    parser.add_argument("--only", help="Only fixtures whose name contains this text")
+    parser.add_argument("--parse-pool", action="store_true", help="Parse pages in the process pool like the bot does")
+    parser.add_argument("--json", dest="json_out", help="Write the report to this JSON file")
+    parser.add_argument("--compare", help="Baseline report (from --json) to compare p50 against")
+    parser.add_argument("--update-expected", action="store_true", help="Store current results as expected")
+    parser.add_argument("--record", nargs=2, metavar=("URL", "NAME"), help="Record a live page into the corpus")
+    args = parser.parse_args()
+
+    if args.record:
+        record_page(*args.record)
+        return 0
+
+    corpus = load_corpus()
+    install_fake_fetch(corpus)
+    modes = ["html", "json"] if args.mode == "both" else [args.mode]
+    report, results = asyncio.run(run_benchmarks(corpus, modes, args.iterations, args.only, args.parse_pool))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["report"]
+    print_report(report, baseline)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"iterations": args.iterations, "report": report}, f, indent=2)
+
+    if args.update_expected:
+        expected = {}
+        if os.path.exists(EXPECTED_FILE):
+            with open(EXPECTED_FILE, "r") as f:
+                expected = json.load(f)
+        expected.update(results)
+        with open(EXPECTED_FILE, "w") as f:
+            json.dump(dict(sorted(expected.items())), f, indent=2)
+            f.write("\n")
+        print(f"Updated {EXPECTED_FILE}")
+        return 0
+
+    mismatches = check_expected(results)
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
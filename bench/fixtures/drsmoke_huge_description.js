@@ -0,0 +1,152 @@
+{
+ "id": 385627214,
+ "title": "Geek Bar Pulse X 25000",
+ "handle": "geek-bar-pulse-x",
+ "price": 2299,
+ "available": true,
+ "options": [
+  "Flavor"
+ ],
+ "variants": [
+  {
+   "id": 40000000000,
+   "title": "Mint Ice",
+   "option1": "Mint Ice",
+   "available": false,
+   "price": 2299
+  },
+  {
+   "id": 40000000001,
+   "title": "Blue Razz Ice",
+   "option1": "Blue Razz Ice",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000002,
+   "title": "Strawberry Kiwi",
+   "option1": "Strawberry Kiwi",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000003,
+   "title": "Watermelon Ice",
+   "option1": "Watermelon Ice",
+   "available": false,
+   "price": 2299
+  },
+  {
+   "id": 40000000004,
+   "title": "Grape Ice",
+   "option1": "Grape Ice",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000005,
+   "title": "Miami Mint",
+   "option1": "Miami Mint",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000006,
+   "title": "Peach Mango",
+   "option1": "Peach Mango",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000007,
+   "title": "Sour Apple",
+   "option1": "Sour Apple",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000008,
+   "title": "Cherry Lemon",
+   "option1": "Cherry Lemon",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000009,
+   "title": "Banana Ice",
+   "option1": "Banana Ice",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000010,
+   "title": "Pink Lemonade",
+   "option1": "Pink Lemonade",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000011,
+   "title": "Tropical Rainbow",
+   "option1": "Tropical Rainbow",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000012,
+   "title": "Cola",
+   "option1": "Cola",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000013,
+   "title": "Clear",
+   "option1": "Clear",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000014,
+   "title": "Triple Berry",
+   "option1": "Triple Berry",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000015,
+   "title": "Blackberry B-Pop",
+   "option1": "Blackberry B-Pop",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000016,
+   "title": "Sakura Grape",
+   "option1": "Sakura Grape",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000017,
+   "title": "Strawberry Mango",
+   "option1": "Strawberry Mango",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000018,
+   "title": "Pineapple Coconut",
+   "option1": "Pineapple Coconut",
+   "available": true,
+   "price": 2299
+  },
+  {
+   "id": 40000000019,
+   "title": "Blueberry Ice",
+   "option1": "Blueberry Ice",
+   "available": true,
+   "price": 2299
+  }
+ ]
+}
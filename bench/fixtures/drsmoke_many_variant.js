@@ -0,0 +1,292 @@
+{
+ "id": 3992650417,
+ "title": "Lost Mary MO20000 Pro",
+ "handle": "lost-mary-mo20000-pro",
+ "price": 1999,
+ "available": true,
+ "options": [
+  "Flavor"
+ ],
+ "variants": [
+  {
+   "id": 40000000000,
+   "title": "Mint Ice",
+   "option1": "Mint Ice",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000001,
+   "title": "Blue Razz Ice",
+   "option1": "Blue Razz Ice",
+   "available": false,
+   "price": 1999
+  },
+  {
+   "id": 40000000002,
+   "title": "Strawberry Kiwi",
+   "option1": "Strawberry Kiwi",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000003,
+   "title": "Watermelon Ice",
+   "option1": "Watermelon Ice",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000004,
+   "title": "Grape Ice",
+   "option1": "Grape Ice",
+   "available": false,
+   "price": 1999
+  },
+  {
+   "id": 40000000005,
+   "title": "Miami Mint",
+   "option1": "Miami Mint",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000006,
+   "title": "Peach Mango",
+   "option1": "Peach Mango",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000007,
+   "title": "Sour Apple",
+   "option1": "Sour Apple",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000008,
+   "title": "Cherry Lemon",
+   "option1": "Cherry Lemon",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000009,
+   "title": "Banana Ice",
+   "option1": "Banana Ice",
+   "available": false,
+   "price": 1999
+  },
+  {
+   "id": 40000000010,
+   "title": "Pink Lemonade",
+   "option1": "Pink Lemonade",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000011,
+   "title": "Tropical Rainbow",
+   "option1": "Tropical Rainbow",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000012,
+   "title": "Cola",
+   "option1": "Cola",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000013,
+   "title": "Clear",
+   "option1": "Clear",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000014,
+   "title": "Triple Berry",
+   "option1": "Triple Berry",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000015,
+   "title": "Blackberry B-Pop",
+   "option1": "Blackberry B-Pop",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000016,
+   "title": "Sakura Grape",
+   "option1": "Sakura Grape",
+   "available": false,
+   "price": 1999
+  },
+  {
+   "id": 40000000017,
+   "title": "Strawberry Mango",
+   "option1": "Strawberry Mango",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000018,
+   "title": "Pineapple Coconut",
+   "option1": "Pineapple Coconut",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000019,
+   "title": "Blueberry Ice",
+   "option1": "Blueberry Ice",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000020,
+   "title": "White Gummy",
+   "option1": "White Gummy",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000021,
+   "title": "Lime Berry Orange",
+   "option1": "Lime Berry Orange",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000022,
+   "title": "Cranberry Grape",
+   "option1": "Cranberry Grape",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000023,
+   "title": "Mango Tango",
+   "option1": "Mango Tango",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000024,
+   "title": "Mint Ice 2",
+   "option1": "Mint Ice 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000025,
+   "title": "Blue Razz Ice 2",
+   "option1": "Blue Razz Ice 2",
+   "available": false,
+   "price": 1999
+  },
+  {
+   "id": 40000000026,
+   "title": "Strawberry Kiwi 2",
+   "option1": "Strawberry Kiwi 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000027,
+   "title": "Watermelon Ice 2",
+   "option1": "Watermelon Ice 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000028,
+   "title": "Grape Ice 2",
+   "option1": "Grape Ice 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000029,
+   "title": "Miami Mint 2",
+   "option1": "Miami Mint 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000030,
+   "title": "Peach Mango 2",
+   "option1": "Peach Mango 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000031,
+   "title": "Sour Apple 2",
+   "option1": "Sour Apple 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000032,
+   "title": "Cherry Lemon 2",
+   "option1": "Cherry Lemon 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000033,
+   "title": "Banana Ice 2",
+   "option1": "Banana Ice 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000034,
+   "title": "Pink Lemonade 2",
+   "option1": "Pink Lemonade 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000035,
+   "title": "Tropical Rainbow 2",
+   "option1": "Tropical Rainbow 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000036,
+   "title": "Cola 2",
+   "option1": "Cola 2",
+   "available": false,
+   "price": 1999
+  },
+  {
+   "id": 40000000037,
+   "title": "Clear 2",
+   "option1": "Clear 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000038,
+   "title": "Triple Berry 2",
+   "option1": "Triple Berry 2",
+   "available": true,
+   "price": 1999
+  },
+  {
+   "id": 40000000039,
+   "title": "Blackberry B-Pop 2",
+   "option1": "Blackberry B-Pop 2",
+   "available": true,
+   "price": 1999
+  }
+ ]
+}
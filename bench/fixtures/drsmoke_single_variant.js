@@ -0,0 +1,19 @@
+{
+ "id": 3779820500,
+ "title": "SMOK Novo 5 Replacement Pods",
+ "handle": "smok-novo-5-pod",
+ "price": 1299,
+ "available": true,
+ "options": [
+  "Title"
+ ],
+ "variants": [
+  {
+   "id": 40000000000,
+   "title": "Default Title",
+   "option1": "Default Title",
+   "available": true,
+   "price": 1299
+  }
+ ]
+}
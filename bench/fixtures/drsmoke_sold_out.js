@@ -0,0 +1,82 @@
+{
+ "id": 2555459477,
+ "title": "Elf Bar BC5000",
+ "handle": "elf-bar-bc5000",
+ "price": 1499,
+ "available": false,
+ "options": [
+  "Flavor"
+ ],
+ "variants": [
+  {
+   "id": 40000000000,
+   "title": "Mint Ice",
+   "option1": "Mint Ice",
+   "available": false,
+   "price": 1499
+  },
+  {
+   "id": 40000000001,
+   "title": "Blue Razz Ice",
+   "option1": "Blue Razz Ice",
+   "available": false,
+   "price": 1499
+  },
+  {
+   "id": 40000000002,
+   "title": "Strawberry Kiwi",
+   "option1": "Strawberry Kiwi",
+   "available": false,
+   "price": 1499
+  },
+  {
+   "id": 40000000003,
+   "title": "Watermelon Ice",
+   "option1": "Watermelon Ice",
+   "available": false,
+   "price": 1499
+  },
+  {
+   "id": 40000000004,
+   "title": "Grape Ice",
+   "option1": "Grape Ice",
+   "available": false,
+   "price": 1499
+  },
+  {
+   "id": 40000000005,
+   "title": "Miami Mint",
+   "option1": "Miami Mint",
+   "available": false,
+   "price": 1499
+  },
+  {
+   "id": 40000000006,
+   "title": "Peach Mango",
+   "option1": "Peach Mango",
+   "available": false,
+   "price": 1499
+  },
+  {
+   "id": 40000000007,
+   "title": "Sour Apple",
+   "option1": "Sour Apple",
+   "available": false,
+   "price": 1499
+  },
+  {
+   "id": 40000000008,
+   "title": "Cherry Lemon",
+   "option1": "Cherry Lemon",
+   "available": false,
+   "price": 1499
+  },
+  {
+   "id": 40000000009,
+   "title": "Banana Ice",
+   "option1": "Banana Ice",
+   "available": false,
+   "price": 1499
+  }
+ ]
+}
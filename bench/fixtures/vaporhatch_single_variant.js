@@ -0,0 +1,19 @@
+{
+ "id": 1683546508,
+ "title": "RAZ TN9000",
+ "handle": "raz-tn9000-1",
+ "price": 1999,
+ "available": true,
+ "options": [
+  "Title"
+ ],
+ "variants": [
+  {
+   "id": 40000000000,
+   "title": "Default Title",
+   "option1": "Default Title",
+   "available": true,
+   "price": 1999
+  }
+ ]
+}
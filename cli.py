@@ -0,0 +1,234 @@
+"""Run the stock scraper without Discord.
+
+Loads the built-in PRODUCTS plus the custom products from the state store
+(importing custom_products.json the first time), checks them, and writes
+every stock change as one JSON object per line:
+
+    python cli.py                                # one sweep, diffs to stdout
+    python cli.py --watch -o diffs.jsonl         # keep sweeping on the adaptive schedule
+    python cli.py --products fogerkit,geekbar --states
+    python cli.py --concurrency 20 --site-concurrency 8
+    python cli.py --worker --shard 1 --shards 4  # one shard of the watchlist, started by the bot
+    python cli.py --watch --webhook https://discord.com/api/webhooks/<id>/<token>
+
+Stock is diffed against what the bot last saved, but a run only saves
+stock and history with --state-db: writing to the bot's database would
+repeat its restock history and use up alerts it hasn't sent yet. Workers
+share the bot's database.
+
+In --worker mode the process only checks the products whose key hashes to
+its shard, takes add / remove commands as JSON lines on stdin, adds "sweep"
+records after every sweep, and exits when stdin closes.
+
+With --webhook (or ALERT_WEBHOOK_URLS) every change is also posted to those
+Discord webhooks, merged and rate limited like the bot's alerts: a small
+notifier with no gateway connection and no slash commands. It replaces the
+bot, it doesn't run next to it: both would scrape the same watchlist and
+post every alert to the same webhooks. To deploy it, point the Procfile's
+worker at it (worker: python cli.py --watch --state-db stock_state.db)
+instead of main.py, so it keeps the saved stock and history.
+
+Logs go to stderr, so stdout stays machine readable. Nothing here imports
+discord, which keeps start-up fast and lets the scraper run apart from the bot.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+import fetcher
+import store
+import scraper
+import shards
+import dispatch
+import metrics
+import webhooks
+
+# ==========================
+# OUTPUT
+# ==========================
+
+def make_writer(out):
+    def write(record):
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+    return write
+
+def write_states(write, results):
+    """One line per checked product with its last known stock (null when it couldn't be read)"""
+    for product_id in results:
+        product = scraper.PRODUCTS.get(product_id)
+        if product is None:
+            continue
+        write({
+            "type": "state",
+            "ts": time.time(),
+            "product": product_id,
+            "name": product["name"],
+            "url": product["url"],
+            "site": product.get("site"),
+            "in_stock": sorted(product["last_stock"]) if product["initialized"] else None,
+            "price": product.get("last_price"),
+        })
+
+# ==========================
+# RUN
+# ==========================
+
+def split_limits(count):
+    """Give each of ``count`` workers its share of the request budget and connection limits"""
+    scraper.REQUEST_BUDGET_PER_MINUTE = max(1, scraper.REQUEST_BUDGET_PER_MINUTE // count)
+    scraper.REQUEST_BUDGET["tokens"] = float(scraper.REQUEST_BUDGET_PER_MINUTE)
+    scraper.SWEEP_CONCURRENCY = max(1, scraper.SWEEP_CONCURRENCY // count)
+    for site, limit in scraper.SITE_CONCURRENCY.items():
+        scraper.SITE_CONCURRENCY[site] = max(1, limit // count)
+    scraper.DEFAULT_SITE_CONCURRENCY = max(1, scraper.DEFAULT_SITE_CONCURRENCY // count)
+
+def configure(args):
+    if args.shards > 1:
+        split_limits(args.shards)
+    if args.worker:
+        # The bot's event loop is elsewhere, and the other workers already use the other cores
+        scraper.PARSE_WORKERS = 0
+    if args.state_db:
+        store.STATE_DB_FILE = args.state_db
+    elif not args.worker:
+        # The bot's database: its saved stock and history stay the bot's to write
+        scraper.PERSIST_STATE = False
+    if args.custom_products:
+        scraper.CUSTOM_PRODUCTS_FILE = args.custom_products
+    if args.concurrency:
+        scraper.SWEEP_CONCURRENCY = args.concurrency
+    if args.site_concurrency:
+        for site in scraper.SITE_CONCURRENCY:
+            scraper.SITE_CONCURRENCY[site] = args.site_concurrency
+        scraper.DEFAULT_SITE_CONCURRENCY = args.site_concurrency
+
+def apply_command(command):
+    """Start or stop watching one product, as told by the bot"""
+    product_id = command.get("product")
+    if command.get("op") == "add" and product_id not in scraper.PRODUCTS:
+        product = dict(command["data"], last_stock=set(), initialized=False)
+        scraper.route_product(product)
+        scraper.PRODUCTS[product_id] = product
+        print(f"Now watching {product['name']}")
+    elif command.get("op") == "remove" and product_id in scraper.PRODUCTS:
+        del scraper.PRODUCTS[product_id]
+        scraper.LAST_SNAPSHOTS.pop(product_id, None)
+        scraper.CATALOG_SNAPSHOTS.pop(product_id, None)
+        scraper.PENDING_STATES.pop(product_id, None)
+
+async def read_commands():
+    """Apply JSON line commands from stdin until it closes"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        try:
+            apply_command(json.loads(line))
+        except Exception as e:
+            print(f"Bad command {line[:200]!r}: {e}")
+
+async def watch(args, write):
+    while True:
+        start = time.monotonic()
+        results = await scraper.run_sweep()
+        if args.states and results:
+            write_states(write, results)
+        if args.worker and results:
+            # Fetch, parse and sweep metrics plus host health, for the bot's /metrics and /stats
+            write({"type": "sweep", "shard": args.shard, "products": len(results),
+                   "seconds": time.monotonic() - start, "metrics": metrics.export_changes(),
+                   "hosts": fetcher.get_host_health()})
+        dispatch.flush()
+        await asyncio.sleep(args.interval)
+
+async def run(args, write):
+    scraper.load_custom_products()
+    if args.products:
+        wanted = set(args.products.split(","))
+        unknown = wanted - set(scraper.PRODUCTS)
+        if unknown:
+            print(f"Unknown products: {', '.join(sorted(unknown))}")
+        for product_id in [p for p in scraper.PRODUCTS if p not in wanted]:
+            del scraper.PRODUCTS[product_id]
+    if args.shards > 1:
+        for product_id in [p for p in scraper.PRODUCTS if shards.shard_for(p, args.shards) != args.shard]:
+            del scraper.PRODUCTS[product_id]
+
+    scraper.add_diff_listener(lambda diff: write({"type": "diff", **diff}))
+    # Workers leave alerts to the bot
+    targets = [] if args.worker else webhooks.load_webhooks(args.webhook or webhooks.ALERT_WEBHOOK_URLS)
+    if targets:
+        scraper.add_diff_listener(lambda diff: dispatch.queue_diff_alerts(
+            diff, lambda flavors: {target: set(flavors) for target in targets}
+        ))
+    try:
+        if not args.watch and not args.worker:
+            results = await scraper.run_sweep(list(scraper.PRODUCTS), use_budget=False)
+            if args.states:
+                write_states(write, results)
+            dispatch.flush()
+            await dispatch.wait_until_sent(timeout=60)
+            return
+
+        if not args.worker:
+            await watch(args, write)
+            return
+
+        write({"type": "ready", "shard": args.shard, "products": len(scraper.PRODUCTS)})
+        sweeps = asyncio.ensure_future(watch(args, write))
+        commands = asyncio.ensure_future(read_commands())
+        # The bot closing our stdin (or going away) is the signal to stop
+        done, _ = await asyncio.wait([sweeps, commands], return_when=asyncio.FIRST_COMPLETED)
+        for task in (sweeps, commands):
+            task.cancel()
+        await asyncio.gather(sweeps, commands, return_exceptions=True)
+        if sweeps in done:
+            # A crashed sweep loop exits the worker so the bot restarts it
+            sweeps.result()
+    finally:
+        scraper.flush_states()
+        scraper.shutdown_parse_pool()
+        await fetcher.close()
+        store.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Check product stock without Discord and print diffs as JSON lines")
+    parser.add_argument("--watch", action="store_true", help="Keep sweeping on the adaptive schedule")
+    parser.add_argument("--interval", type=float, default=scraper.SCHEDULER_TICK_SECONDS,
+                        help="Seconds between scheduler ticks with --watch")
+    parser.add_argument("-o", "--output", help="Append JSON lines to this file instead of stdout")
+    parser.add_argument("--products", help="Comma separated product IDs to check (default: all)")
+    parser.add_argument("--states", action="store_true", help="Also write each checked product's current stock")
+    parser.add_argument("--concurrency", type=int, help="Max pages fetched at once")
+    parser.add_argument("--site-concurrency", type=int, help="Max pages fetched at once per site")
+    parser.add_argument("--state-db", help="State database to read and save stock to "
+                        "(default: read the bot's and save nothing, unless --worker)")
+    parser.add_argument("--custom-products", help="Legacy custom_products.json to import on first run")
+    parser.add_argument("--webhook", action="append", help="Discord webhook URL to post alerts to (repeatable)")
+    parser.add_argument("--worker", action="store_true", help="Run as one of the bot's scraper workers")
+    parser.add_argument("--shard", type=int, default=0, help="This worker's shard number")
+    parser.add_argument("--shards", type=int, default=1, help="Number of workers the watchlist is split across")
+    args = parser.parse_args()
+    configure(args)
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    write = make_writer(out)
+    try:
+        # Scraper logs use print; keep them off stdout so the output stays parseable
+        with contextlib.redirect_stdout(sys.stderr):
+            asyncio.run(run(args, write))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
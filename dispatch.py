@@ -0,0 +1,185 @@
+import asyncio
+import random
+import time
+import metrics
+
+# ==========================
+# CONFIG
+# ==========================
+
+# Discord's per-channel limit is about 5 messages every 5 seconds
+RATE_LIMIT_MESSAGES = 5
+RATE_LIMIT_SECONDS = 5.0
+
+MAX_MESSAGE_LENGTH = 2000
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 2.0
+
+# ==========================
+# ALERT DISPATCH
+# ==========================
+
+class PermanentSendError(Exception):
+    """Raised by a sender when retrying can't help (missing channel, no permission)"""
+
+# target kind -> async send(target, text) installed by an output backend (None = any other kind)
+SENDERS = {}
+
+# target -> [(queued_at, text)] collected during the current sweep
+PENDING = {}
+
+# target -> asyncio.Queue of (queued_at, text) ready to send, drained by one worker per target
+QUEUES = {}
+WORKERS = {}
+
+# target -> {"tokens", "updated"} token bucket
+BUCKETS = {}
+
+DISPATCH_STATS = {
+    "alerts": 0,
+    "messages": 0,
+    "sent": 0,
+    "retries": 0,
+    "failed": 0,
+    "last_latency": None,
+    "max_latency": None,
+    "total_latency": 0.0,
+}
+
+def set_sender(send, kind=None):
+    """Install the coroutine that delivers one message to targets of ``kind`` (default: all others)"""
+    SENDERS[kind] = send
+
+def get_sender(target):
+    return SENDERS.get(target[0]) or SENDERS.get(None)
+
+def queue_alert(target, text):
+    """Collect an alert for ``target``; nothing is sent until flush()"""
+    PENDING.setdefault(target, []).append((time.monotonic(), text))
+    DISPATCH_STATS["alerts"] += 1
+
+def pack_messages(texts, limit=MAX_MESSAGE_LENGTH):
+    """Merge alert texts into as few messages as fit under Discord's length limit"""
+    messages = []
+    current = ""
+    for text in texts:
+        if len(text) > limit:
+            # A single huge alert (hundreds of flavors): cut it and close the code block
+            text = text[:limit - 10] + "\n…" + ("```" if text.count("```") % 2 == 0 else "")
+        if current and len(current) + 2 + len(text) > limit:
+            messages.append(current)
+            current = ""
+        current = f"{current}\n\n{text}" if current else text
+    if current:
+        messages.append(current)
+    return messages
+
+def flush():
+    """Merge everything collected this sweep and hand it to the per-target workers"""
+    for target, alerts in list(PENDING.items()):
+        queued_at = min(t for t, _ in alerts)
+        queue = QUEUES.setdefault(target, asyncio.Queue())
+        for message in pack_messages([text for _, text in alerts]):
+            queue.put_nowait((queued_at, message))
+            DISPATCH_STATS["messages"] += 1
+        if target not in WORKERS or WORKERS[target].done():
+            WORKERS[target] = asyncio.ensure_future(drain(target))
+    PENDING.clear()
+
+async def wait_until_sent(timeout=None):
+    """Wait for every flushed message to be sent or given up on (before a one-shot run exits)"""
+    workers = [worker for worker in WORKERS.values() if not worker.done()]
+    if workers:
+        await asyncio.wait(workers, timeout=timeout)
+
+def queue_depth():
+    """Messages waiting to be sent plus alerts not flushed yet"""
+    return sum(q.qsize() for q in QUEUES.values()) + sum(len(a) for a in PENDING.values())
+
+def get_dispatch_stats():
+    stats = dict(DISPATCH_STATS)
+    stats["queue_depth"] = queue_depth()
+    stats["avg_latency"] = DISPATCH_STATS["total_latency"] / DISPATCH_STATS["sent"] if DISPATCH_STATS["sent"] else None
+    return stats
+
+async def wait_for_token(target):
+    """Block until the target's rate-limit bucket allows another message"""
+    bucket = BUCKETS.setdefault(target, {"tokens": float(RATE_LIMIT_MESSAGES), "updated": time.monotonic()})
+    rate = RATE_LIMIT_MESSAGES / RATE_LIMIT_SECONDS
+    while True:
+        now = time.monotonic()
+        bucket["tokens"] = min(float(RATE_LIMIT_MESSAGES), bucket["tokens"] + (now - bucket["updated"]) * rate)
+        bucket["updated"] = now
+        if bucket["tokens"] >= 1:
+            bucket["tokens"] -= 1
+            return
+        await asyncio.sleep((1 - bucket["tokens"]) / rate)
+
+async def drain(target):
+    """Send a target's queued messages in order, retrying failures with backoff"""
+    queue = QUEUES[target]
+    while not queue.empty():
+        queued_at, text = queue.get_nowait()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await wait_for_token(target)
+            try:
+                with metrics.timer("dispatch_send_seconds"):
+                    await get_sender(target)(target, text)
+            except PermanentSendError as e:
+                print(f"Dropping alert for {target}: {e}")
+                DISPATCH_STATS["failed"] += 1
+                metrics.inc("alerts_total", result="dropped")
+                break
+            except Exception as e:
+                if attempt == MAX_ATTEMPTS:
+                    print(f"Giving up on alert for {target} after {attempt} attempts: {e}")
+                    DISPATCH_STATS["failed"] += 1
+                    metrics.inc("alerts_total", result="failed")
+                    break
+                DISPATCH_STATS["retries"] += 1
+                metrics.inc("alerts_total", result="retried")
+                # Honour the server's retry hint when there is one
+                delay = getattr(e, "retry_after", None) or RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                await asyncio.sleep(delay * random.uniform(1.0, 1.25))
+            else:
+                latency = time.monotonic() - queued_at
+                metrics.observe("dispatch_latency_seconds", latency)
+                metrics.inc("alerts_total", result="sent")
+                DISPATCH_STATS["sent"] += 1
+                DISPATCH_STATS["last_latency"] = latency
+                DISPATCH_STATS["total_latency"] += latency
+                if DISPATCH_STATS["max_latency"] is None or latency > DISPATCH_STATS["max_latency"]:
+                    DISPATCH_STATS["max_latency"] = latency
+                break
+
+# ==========================
+# STOCK ALERTS
+# ==========================
+
+def format_stock_alert(title, product, price, inventory_label, inventory_info, flavors):
+    """Build one restock or sell-out message"""
+    message = f"{title}\n"
+    message += f"💲 **Price:** {price}\n"
+    if inventory_info:
+        message += f"📦 **{inventory_label}:** {inventory_info}\n"
+    message += f"🔗 {product['url']}\n"
+    message += "```" + "\n".join(f"- {i}" for i in sorted(flavors)) + "```"
+    return message
+
+def queue_diff_alerts(diff, get_recipients):
+    """Queue restock / sell-out messages for one stock change
+
+    ``get_recipients(flavors)`` returns {target: flavors} for the changed flavors.
+    """
+    if diff["restocked"]:
+        for target, flavors in get_recipients(diff["restocked"]).items():
+            queue_alert(target, format_stock_alert(
+                f"🚨 **{diff['name']} RESTOCKED!**", diff, diff["price"],
+                "Inventory", diff["inventory_info"], flavors
+            ))
+    if diff["sold_out"]:
+        for target, flavors in get_recipients(diff["sold_out"]).items():
+            queue_alert(target, format_stock_alert(
+                f"❌ **{diff['name']} SOLD OUT**", diff, diff["price"],
+                "Last Inventory", diff["inventory_info"], flavors
+            ))
@@ -0,0 +1,352 @@
+import os
+import time
+import random
+import asyncio
+import hashlib
+import json
+import urllib.parse
+from collections import namedtuple
+import aiohttp
+import metrics
+
+# aiohttp only decodes brotli when one of these is installed (pip install Brotli)
+try:
+    import brotli  # noqa: F401
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+# ==========================
+# CONFIG
+# ==========================
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Encoding": "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate",
+}
+DEFAULT_TIMEOUT = 15
+
+# Connections kept open per store host, and how long idle ones stay alive
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "8"))
+KEEPALIVE_SECONDS = float(os.environ.get("HTTP_KEEPALIVE_SECONDS", "60"))
+
+# Optional aiohttp resolver for every session (the load test points store hosts at a local stand-in)
+RESOLVER = None
+
+# Max URLs we keep ETag / Last-Modified / digest validators for
+MAX_VALIDATORS = 5000
+
+# Consecutive failures that open a host's circuit, and how long it stays open
+# (doubling on every failed probe, with jitter, up to the max)
+BREAKER_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", "5"))
+BREAKER_BASE_SECONDS = float(os.environ.get("BREAKER_BASE_SECONDS", "30"))
+BREAKER_MAX_SECONDS = float(os.environ.get("BREAKER_MAX_SECONDS", "900"))
+
+# Timeouts follow each host's measured latency instead of always waiting the full timeout
+MIN_TIMEOUT = 3.0
+TIMEOUT_DEVIATIONS = 4
+
+# ==========================
+# ASYNC HTTP ENGINE
+# ==========================
+
+# One pooled session per host, created lazily inside the running event loop
+_sessions = {}
+
+# Returned instead of a body when a conditional fetch finds nothing new
+NOT_MODIFIED = object()
+
+# url -> {"etag", "last_modified", "digest"} from the last 200 response
+VALIDATORS = {}
+
+# An undecoded response body with what's needed to decode it and store its validators later
+RawPage = namedtuple("RawPage", ["url", "status", "body", "encoding", "etag", "last_modified"])
+
+# host -> {"failures", "trips", "open_until", "probing", "srtt", "rttvar", ...}
+HOST_HEALTH = {}
+
+class HostUnavailable(Exception):
+    """Raised without touching the network while a host's circuit is open"""
+
+class ServerError(Exception):
+    """A 5xx or 429 answer: the page can't be trusted to show real stock"""
+
+def get_host(url):
+    return urllib.parse.urlparse(url).netloc.lower()
+
+def get_health(host):
+    health = HOST_HEALTH.get(host)
+    if health is None:
+        health = {
+            "failures": 0,
+            "trips": 0,
+            "open_until": 0.0,
+            "probing": False,
+            "srtt": None,
+            "rttvar": None,
+            "timeout_scale": 1,
+            "requests": 0,
+            "errors": 0,
+            "rejected": 0,
+        }
+        HOST_HEALTH[host] = health
+    return health
+
+def host_available(url):
+    """False while the URL's host circuit is open (fetches would fail fast)"""
+    health = HOST_HEALTH.get(get_host(url))
+    return health is None or time.monotonic() >= health["open_until"]
+
+def retry_after(url):
+    """Seconds until the URL's host may be tried again (0 when it's healthy)"""
+    health = HOST_HEALTH.get(get_host(url))
+    return max(0.0, health["open_until"] - time.monotonic()) if health else 0.0
+
+def is_host_failure(error):
+    """Whether an exception means the host itself is in trouble (not just one missing page)"""
+    return isinstance(error, (HostUnavailable, ServerError, asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+def adaptive_timeout(health, timeout):
+    """Smoothed latency plus a few deviations (at least MIN_TIMEOUT), scaled up after timeouts, capped at ``timeout``"""
+    if health["srtt"] is None:
+        return timeout
+    estimate = max(MIN_TIMEOUT, health["srtt"] + TIMEOUT_DEVIATIONS * health["rttvar"])
+    return min(timeout, estimate * health["timeout_scale"])
+
+def before_request(host):
+    """Admit a request, or raise HostUnavailable while the circuit is open"""
+    health = get_health(host)
+    if health["failures"] >= BREAKER_THRESHOLD:
+        if time.monotonic() < health["open_until"] or health["probing"]:
+            health["rejected"] += 1
+            wait = max(0.0, health["open_until"] - time.monotonic())
+            raise HostUnavailable(f"{host} is unavailable, retrying in {wait:.0f}s")
+        # Half-open: let a single probe through
+        health["probing"] = True
+    health["requests"] += 1
+    return health
+
+def record_success(health, elapsed):
+    # Smoothed latency and deviation, as TCP does for its retransmit timer
+    if health["srtt"] is None:
+        health["srtt"] = elapsed
+        health["rttvar"] = elapsed / 2
+    else:
+        health["rttvar"] = 0.75 * health["rttvar"] + 0.25 * abs(health["srtt"] - elapsed)
+        health["srtt"] = 0.875 * health["srtt"] + 0.125 * elapsed
+    health["failures"] = 0
+    health["trips"] = 0
+    health["probing"] = False
+    health["timeout_scale"] = 1
+
+def record_failure(host, health, timed_out=False):
+    if timed_out:
+        # The host may just have got slower: double the timeout, like a TCP retransmit
+        health["timeout_scale"] = min(health["timeout_scale"] * 2, 16)
+    health["errors"] += 1
+    health["failures"] += 1
+    health["probing"] = False
+    if health["failures"] >= BREAKER_THRESHOLD:
+        health["trips"] += 1
+        cooldown = min(BREAKER_MAX_SECONDS, BREAKER_BASE_SECONDS * 2 ** (health["trips"] - 1))
+        health["open_until"] = time.monotonic() + cooldown * random.uniform(0.8, 1.2)
+        print(f"Circuit open for {host} after {health['failures']} failures, backing off {cooldown:.0f}s")
+
+def get_host_health():
+    """{host: summary} for logging and metrics"""
+    now = time.monotonic()
+    return {
+        host: {
+            "open": now < health["open_until"] and health["failures"] >= BREAKER_THRESHOLD,
+            "failures": health["failures"],
+            "latency": health["srtt"],
+            "timeout": adaptive_timeout(health, DEFAULT_TIMEOUT),
+            "requests": health["requests"],
+            "errors": health["errors"],
+            "rejected": health["rejected"],
+        }
+        for host, health in HOST_HEALTH.items()
+    }
+
+def get_session(url):
+    """Return the keep-alive session for the URL's host, creating it on first use"""
+    host = urllib.parse.urlparse(url).netloc.lower()
+    session = _sessions.get(host)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_SIZE,
+            limit_per_host=POOL_SIZE,
+            keepalive_timeout=KEEPALIVE_SECONDS,
+            ttl_dns_cache=300,
+            resolver=RESOLVER,
+        )
+        session = aiohttp.ClientSession(headers=HEADERS, connector=connector, auto_decompress=True)
+        _sessions[host] = session
+    return session
+
+def forget(url):
+    """Drop stored validators so the next conditional fetch downloads the page"""
+    VALIDATORS.pop(url, None)
+
+def remember_validators(page, digest):
+    """Store validators from a successful response for the next conditional fetch"""
+    VALIDATORS.pop(page.url, None)
+    if len(VALIDATORS) >= MAX_VALIDATORS:
+        # Dicts keep insertion order, so this drops the least recently stored URL
+        VALIDATORS.pop(next(iter(VALIDATORS)))
+    VALIDATORS[page.url] = {
+        "etag": page.etag,
+        "last_modified": page.last_modified,
+        "digest": digest,
+    }
+
+def get_digest(url):
+    """Digest stored by the last conditional fetch of a URL (None if there is none)"""
+    cached = VALIDATORS.get(url)
+    return cached["digest"] if cached else None
+
+def fragment_digest(text):
+    """Hash of the part of a page a parser reads, for servers that ignore validators"""
+    return hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()
+
+def decode_page(page):
+    return page.body.decode(page.encoding, errors="replace")
+
+def finish_conditional(page, digest):
+    """Store a page's validators and digest; returns False when the digest is unchanged"""
+    if page.status != 200:
+        return True
+    previous = get_digest(page.url)
+    remember_validators(page, digest)
+    return previous != digest
+
+async def get_page(url, timeout, conditional):
+    """GET a URL through the host's circuit breaker"""
+    host = get_host(url)
+    try:
+        health = before_request(host)
+    except HostUnavailable:
+        metrics.inc("fetch_errors_total", host=host, error="HostUnavailable")
+        raise
+    start = time.monotonic()
+    try:
+        with metrics.timer("fetch_seconds", host=host):
+            result = await request_page(url, adaptive_timeout(health, timeout), conditional)
+    except aiohttp.ClientResponseError:
+        # A missing page is the page's problem, not the host's (5xx raise ServerError)
+        record_success(health, time.monotonic() - start)
+        raise
+    except asyncio.CancelledError:
+        health["probing"] = False
+        raise
+    except asyncio.TimeoutError:
+        metrics.inc("fetch_errors_total", host=host, error="TimeoutError")
+        record_failure(host, health, timed_out=True)
+        raise
+    except Exception as e:
+        metrics.inc("fetch_errors_total", host=host, error=type(e).__name__)
+        record_failure(host, health)
+        raise
+    record_success(health, time.monotonic() - start)
+    return result
+
+async def request_page(url, timeout, conditional):
+    """GET a URL, honouring stored validators when ``conditional`` is set"""
+    session = get_session(url)
+    cached = VALIDATORS.get(url) if conditional else None
+
+    headers = {}
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+        metrics.inc("requests_total", host=get_host(url), status=str(r.status))
+        if r.status == 304 and cached:
+            return NOT_MODIFIED
+        if r.status >= 500 or r.status == 429:
+            # An error page would parse as "no stock" and look like a mass sell-out
+            raise ServerError(f"{url} answered {r.status}")
+        if not 200 <= r.status < 300:
+            # Same for 403 / 404 / 410 pages: the stock behind them is unknown
+            raise aiohttp.ClientResponseError(
+                r.request_info, r.history, status=r.status, message=r.reason or "", headers=r.headers
+            )
+        body = await r.read()
+        metrics.inc("response_bytes_total", len(body), host=get_host(url))
+        return RawPage(
+            url=url,
+            status=r.status,
+            body=body,
+            encoding=r.get_encoding(),
+            etag=r.headers.get("ETag"),
+            last_modified=r.headers.get("Last-Modified"),
+        )
+
+async def fetch(url, timeout=DEFAULT_TIMEOUT, conditional=False, fragment=None):
+    """Download a page without blocking the event loop and return its text
+
+    With ``conditional=True`` this returns NOT_MODIFIED when the server answers
+    304, or when ``fragment(text)`` hashes the same as on the previous fetch.
+    Raises HostUnavailable while the host's circuit is open, ServerError on
+    5xx / 429 answers and aiohttp.ClientResponseError on any other non-2xx.
+    """
+    page = await get_page(url, timeout, conditional)
+    if page is NOT_MODIFIED:
+        return NOT_MODIFIED
+    text = decode_page(page)
+    if not conditional:
+        return text
+
+    # Servers that ignore validators: compare a hash of the part of the page we parse
+    if not finish_conditional(page, fragment_digest(fragment(text) if fragment else text)):
+        return NOT_MODIFIED
+    return text
+
+async def fetch_raw(url, timeout=DEFAULT_TIMEOUT, conditional=False):
+    """Like fetch(), but return the undecoded RawPage so decoding and hashing can run elsewhere
+
+    A conditional caller finishes with finish_conditional(page, digest).
+    """
+    return await get_page(url, timeout, conditional)
+
+async def fetch_json(url, timeout=DEFAULT_TIMEOUT):
+    """Download and decode a JSON document (raises on HTTP errors)"""
+    page = await get_page(url, timeout, False)
+    # Shopify serves .js product data as application/javascript, so decode by hand
+    return json.loads(decode_page(page))
+
+async def fetch_json_page(url, timeout=DEFAULT_TIMEOUT, conditional=False):
+    """Download and decode a JSON document, returning (page, digest, data)
+
+    With ``conditional=True`` this returns NOT_MODIFIED when the server answers
+    304 or the body hashes the same as the last document stored for the URL.
+    Nothing new is stored here: the caller calls finish_conditional(page, digest)
+    once ``data`` proved usable, so an error page is never later taken as unchanged.
+    """
+    page = await get_page(url, timeout, conditional)
+    if page is NOT_MODIFIED:
+        return NOT_MODIFIED
+    text = decode_page(page)
+    digest = fragment_digest(text)
+    if conditional and page.status == 200 and digest == get_digest(url):
+        # Same document as the one that parsed last time; keep its fresh validators
+        remember_validators(page, digest)
+        return NOT_MODIFIED
+    return page, digest, json.loads(text)
+
+async def close():
+    """Close every pooled session (call on shutdown)"""
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        if not session.closed:
+            await session.close()
+    # Give the connectors a moment to release their sockets
+    await asyncio.sleep(0)
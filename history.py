@@ -0,0 +1,297 @@
+import os
+import time
+import store
+
+# ==========================
+# CONFIG
+# ==========================
+
+# Events older than this are dropped, and the log never grows past HISTORY_MAX_EVENTS rows
+HISTORY_RETENTION_DAYS = int(os.environ.get("HISTORY_RETENTION_DAYS", "365"))
+HISTORY_MAX_EVENTS = int(os.environ.get("HISTORY_MAX_EVENTS", "5000000"))
+
+# Compaction deletes this many events per transaction and frees this many pages per
+# vacuum step, so the bot's own writes never wait long behind it
+COMPACT_BATCH = 5000
+VACUUM_BATCH_PAGES = 2000
+
+RESTOCKED = 1
+SOLD_OUT = 2
+PRICE_CHANGED = 3
+
+EVENT_NAMES = {RESTOCKED: "restocked", SOLD_OUT: "sold_out", PRICE_CHANGED: "price"}
+
+# Products and flavors are dictionary-encoded so each event row is a few small integers
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_products (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS history_flavors (
+    id INTEGER PRIMARY KEY,
+    product_id INTEGER NOT NULL,
+    flavor TEXT NOT NULL,
+    UNIQUE (product_id, flavor)
+);
+
+-- Clustered by (product, time): range queries read one contiguous slice without
+-- a separate index (compaction adds one on ts). flavor_id 0 marks product-level events.
+CREATE TABLE IF NOT EXISTS stock_events (
+    product_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    flavor_id INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    value TEXT,
+    PRIMARY KEY (product_id, ts, flavor_id, kind)
+) WITHOUT ROWID;
+
+-- flavor_generation goes up whenever compaction deletes flavors, so every
+-- process (the bot and its scraper workers) knows its cached ids are stale
+CREATE TABLE IF NOT EXISTS history_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# ==========================
+# HISTORY LOG
+# ==========================
+
+_ready = False
+
+# Dictionary ids already looked up, so recording is usually insert-only
+_product_ids = {}
+_flavor_ids = {}
+
+# history_meta's flavor_generation when _flavor_ids was last known to be valid
+_flavor_generation = None
+
+# Events waiting for the next flush: (ts, product_key, flavor, kind, value)
+PENDING_EVENTS = []
+
+def get_connection():
+    global _ready
+    conn = store.get_connection()
+    if not _ready:
+        conn.executescript(SCHEMA)
+        conn.commit()
+        _ready = True
+    return conn
+
+def get_product_id(conn, key, create=True):
+    if key not in _product_ids:
+        row = conn.execute("SELECT id FROM history_products WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            if not create:
+                return None
+            row = (conn.execute("INSERT INTO history_products (key) VALUES (?)", (key,)).lastrowid,)
+        _product_ids[key] = row[0]
+    return _product_ids[key]
+
+def get_flavor_id(conn, product_id, flavor):
+    cache_key = (product_id, flavor)
+    if cache_key not in _flavor_ids:
+        row = conn.execute(
+            "SELECT id FROM history_flavors WHERE product_id = ? AND flavor = ?", (product_id, flavor)
+        ).fetchone()
+        if row is None:
+            row = (conn.execute(
+                "INSERT INTO history_flavors (product_id, flavor) VALUES (?, ?)", (product_id, flavor)
+            ).lastrowid,)
+        _flavor_ids[cache_key] = row[0]
+    return _flavor_ids[cache_key]
+
+def check_flavor_generation(conn):
+    """Drop cached flavor ids when compaction (in any process) deleted flavors since they were read"""
+    global _flavor_generation
+    row = conn.execute("SELECT value FROM history_meta WHERE key = 'flavor_generation'").fetchone()
+    generation = row[0] if row else 0
+    if generation != _flavor_generation:
+        # Deleted ids may also have been reused for other flavors
+        _flavor_ids.clear()
+        _flavor_generation = generation
+
+def record_transitions(product_key, restocked, sold_out, old_price=None, new_price=None, ts=None):
+    """Queue the transitions one check produced"""
+    ts = int(ts if ts is not None else time.time())
+    for flavor in restocked:
+        PENDING_EVENTS.append((ts, product_key, flavor, RESTOCKED, None))
+    for flavor in sold_out:
+        PENDING_EVENTS.append((ts, product_key, flavor, SOLD_OUT, None))
+    if old_price is not None and new_price is not None and old_price != new_price:
+        PENDING_EVENTS.append((ts, product_key, None, PRICE_CHANGED, new_price))
+
+def flush():
+    """Append every queued event in one transaction; they stay queued if the write fails"""
+    global _flavor_generation
+    if not PENDING_EVENTS:
+        return
+    events = list(PENDING_EVENTS)
+
+    conn = get_connection()
+    try:
+        with conn:
+            # Hold the write lock before trusting cached ids, compaction may drop unused flavors
+            conn.execute("BEGIN IMMEDIATE")
+            check_flavor_generation(conn)
+            rows = []
+            for ts, product_key, flavor, kind, value in events:
+                product_id = get_product_id(conn, product_key)
+                flavor_id = get_flavor_id(conn, product_id, flavor) if flavor is not None else 0
+                rows.append((product_id, ts, flavor_id, kind, value))
+            conn.executemany(
+                "INSERT OR IGNORE INTO stock_events (product_id, ts, flavor_id, kind, value) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+    except Exception:
+        # Ids inserted by the rolled back transaction don't exist
+        _product_ids.clear()
+        _flavor_ids.clear()
+        _flavor_generation = None
+        raise
+    del PENDING_EVENTS[:len(events)]
+
+# ==========================
+# QUERIES
+# ==========================
+
+def recent_events(product_key, since, limit=20):
+    """Newest-first [(ts, kind, flavor, value)] for a product since a unix time"""
+    conn = get_connection()
+    product_id = get_product_id(conn, product_key, create=False)
+    if product_id is None:
+        return []
+    return conn.execute(
+        "SELECT e.ts, e.kind, f.flavor, e.value FROM stock_events e "
+        "LEFT JOIN history_flavors f ON f.id = e.flavor_id "
+        "WHERE e.product_id = ? AND e.ts >= ? ORDER BY e.ts DESC LIMIT ?",
+        (product_id, int(since), limit)
+    ).fetchall()
+
+def count_events(product_key, since):
+    """{kind: count} for a product since a unix time"""
+    conn = get_connection()
+    product_id = get_product_id(conn, product_key, create=False)
+    if product_id is None:
+        return {}
+    rows = conn.execute(
+        "SELECT kind, COUNT(*) FROM stock_events WHERE product_id = ? AND ts >= ? GROUP BY kind",
+        (product_id, int(since))
+    )
+    return dict(rows.fetchall())
+
+def flavor_restock_stats(product_key, since):
+    """Per flavor: restock count, average time in stock (seconds or None) and last restock
+
+    Time in stock pairs each restock with the next event for the same flavor
+    when that event is a sell-out.
+    """
+    conn = get_connection()
+    product_id = get_product_id(conn, product_key, create=False)
+    if product_id is None:
+        return []
+    return conn.execute(
+        """
+        WITH ordered AS (
+            SELECT flavor_id, ts, kind,
+                   LEAD(ts) OVER (PARTITION BY flavor_id ORDER BY ts) AS next_ts,
+                   LEAD(kind) OVER (PARTITION BY flavor_id ORDER BY ts) AS next_kind
+            FROM stock_events
+            WHERE product_id = ? AND ts >= ? AND flavor_id > 0 AND kind IN (?, ?)
+        )
+        SELECT f.flavor,
+               SUM(o.kind = ?) AS restocks,
+               AVG(CASE WHEN o.kind = ? AND o.next_kind = ? THEN o.next_ts - o.ts END) AS avg_in_stock,
+               MAX(CASE WHEN o.kind = ? THEN o.ts END) AS last_restock
+        FROM ordered o JOIN history_flavors f ON f.id = o.flavor_id
+        GROUP BY o.flavor_id
+        HAVING restocks > 0
+        ORDER BY restocks DESC, f.flavor
+        """,
+        (product_id, int(since), RESTOCKED, SOLD_OUT,
+         RESTOCKED, RESTOCKED, SOLD_OUT, RESTOCKED)
+    ).fetchall()
+
+# ==========================
+# RETENTION
+# ==========================
+
+def delete_events_before(conn, cutoff):
+    """Delete events with ts < cutoff, oldest first, a bounded batch per transaction"""
+    deleted = 0
+    while True:
+        row = conn.execute(
+            "SELECT ts FROM stock_events WHERE ts < ? ORDER BY ts LIMIT 1 OFFSET ?",
+            (cutoff, COMPACT_BATCH - 1)
+        ).fetchone()
+        # No full batch left: the rest below the cutoff goes in one go
+        bound = row[0] + 1 if row else cutoff
+        with conn:
+            deleted += conn.execute("DELETE FROM stock_events WHERE ts < ?", (bound,)).rowcount
+        if row is None:
+            return deleted
+
+def compact(now=None):
+    """Apply retention, cap the log size and give freed pages back to the filesystem
+
+    Blocking: run it in a thread. It uses its own connection and short write
+    transactions, so the bot's state and history writes interleave with it.
+    """
+    now = now if now is not None else time.time()
+    conn = store.open_connection()
+    try:
+        conn.executescript(SCHEMA)
+        # Retention and the size cap both walk events by time; created here so an
+        # existing large log is indexed off the event loop
+        conn.execute("CREATE INDEX IF NOT EXISTS stock_events_ts ON stock_events (ts)")
+        conn.commit()
+
+        deleted = delete_events_before(conn, int(now - HISTORY_RETENTION_DAYS * 86400))
+
+        overflow = conn.execute("SELECT COUNT(*) FROM stock_events").fetchone()[0] - HISTORY_MAX_EVENTS
+        if overflow > 0:
+            # Still too big: drop the oldest events across all products
+            cutoff = conn.execute(
+                "SELECT ts FROM stock_events ORDER BY ts LIMIT 1 OFFSET ?", (overflow - 1,)
+            ).fetchone()[0]
+            deleted += delete_events_before(conn, cutoff + 1)
+
+        if deleted:
+            # Drop dictionary entries nothing refers to any more: found without the write
+            # lock, then checked again under it
+            unused_sql = (
+                "SELECT 1 FROM stock_events e WHERE e.product_id = f.product_id AND e.flavor_id = f.id"
+            )
+            unused = conn.execute(
+                f"SELECT id FROM history_flavors f WHERE NOT EXISTS ({unused_sql})"
+            ).fetchall()
+            if unused:
+                with conn:
+                    conn.executemany(
+                        f"DELETE FROM history_flavors AS f WHERE id = ? AND NOT EXISTS ({unused_sql})", unused
+                    )
+                    # Bumped in the same transaction: each process's next flush re-reads its ids
+                    conn.execute(
+                        "INSERT INTO history_meta (key, value) VALUES ('flavor_generation', 1) "
+                        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+                    )
+
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                # A few pages per step, each in its own transaction
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                while free:
+                    conn.execute(f"PRAGMA incremental_vacuum({VACUUM_BATCH_PAGES})").fetchall()
+                    left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                    if left >= free:
+                        break
+                    free = left
+            else:
+                # Databases created before incremental vacuum was enabled need one full VACUUM
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+            # Fold the WAL back in so the file actually shrinks
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+    finally:
+        conn.close()
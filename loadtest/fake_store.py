@@ -0,0 +1,274 @@
+"""Local stand-in for the VaporHatch and DrSmoke Shopify storefronts.
+
+Serves synthetic products in both sites' markup and JSON, picking the site
+from the Host header (point vaporhatch.com / drsmoke.com at 127.0.0.1):
+
+    python loadtest/fake_store.py --products 2000
+    python loadtest/fake_store.py --latency 0.05 --jitter 0.02 --error-rate 0.01
+    python loadtest/fake_store.py --flap 0.1 --flap-seconds 5 --etag ignore
+
+Endpoints, per site:
+
+    /products/<handle>          product page (lt-00000 ... lt-NNNNN)
+    /products/<handle>.js       Shopify product JSON (prices in cents)
+    /products.json?limit&page   paginated catalog (prices as strings)
+    /_stats                     request counts by endpoint and status
+
+Each variant flips between in stock and sold out with probability --flap
+every --flap-seconds, so a sweep sees a steady trickle of restocks.
+--etag honor answers If-None-Match with 304, ignore sends an ETag but
+always returns the page, none sends no validators at all.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from aiohttp import web
+
+FLAVORS = [
+    "Blue Razz Ice", "Strawberry Kiwi", "Watermelon Ice", "Cool Mint", "Mango Peach",
+    "Grape Ice", "Pink Lemonade", "Miami Mint", "Sour Apple", "Cherry Cola",
+    "Peach Ice", "Banana Ice", "Tropical Rainbow", "Lush Ice", "Blueberry Raspberry",
+    "Pineapple Coconut", "Triple Berry", "Cotton Candy", "Kiwi Passion", "Clear",
+]
+
+SITES = {
+    "vaporhatch": {"title": "VaporHatch", "name": "Hatch Bar"},
+    "drsmoke": {"title": "Dr. Smoke", "name": "Smoke Stick"},
+}
+
+# ==========================
+# CATALOG
+# ==========================
+
+class Catalog:
+    """Synthetic products for one site, with stock that flaps over time"""
+
+    def __init__(self, site, count, variants, flap, flap_seconds, seed):
+        self.site = site
+        self.count = count
+        self.variants = variants
+        self.flap = flap
+        self.flap_seconds = flap_seconds
+        self.seed = seed
+        # index -> {"stock": [bool], "epoch"}
+        self.state = {}
+
+    def handle(self, index):
+        return f"lt-{index:05d}"
+
+    def index_of(self, handle):
+        if not handle.startswith("lt-"):
+            return None
+        try:
+            index = int(handle[3:])
+        except ValueError:
+            return None
+        return index if 0 <= index < self.count else None
+
+    def product(self, index):
+        """Static product data: name, flavors and price in cents"""
+        rng = random.Random(f"{self.seed}:{self.site}:{index}")
+        flavors = rng.sample(FLAVORS, min(self.variants, len(FLAVORS)))
+        return {
+            "id": 1000000 + index,
+            "handle": self.handle(index),
+            "title": f"{SITES[self.site]['name']} {index}",
+            "flavors": flavors,
+            "price": rng.choice([1299, 1499, 1999, 2499]),
+        }
+
+    def stock(self, index):
+        """Current [in stock] per flavor, advancing one flip roll per elapsed epoch"""
+        epoch = int(time.monotonic() / self.flap_seconds) if self.flap_seconds else 0
+        state = self.state.get(index)
+        if state is None:
+            rng = random.Random(f"{self.seed}:{self.site}:{index}:stock")
+            state = {"stock": [rng.random() < 0.7 for _ in range(self.variants)], "epoch": epoch}
+            self.state[index] = state
+        # Long idle gaps only need a few rolls to look random again
+        for _ in range(min(epoch - state["epoch"], 10)):
+            state["stock"] = [not s if random.random() < self.flap else s for s in state["stock"]]
+        state["epoch"] = epoch
+        return state["stock"]
+
+    def variants_json(self, index, cents):
+        product = self.product(index)
+        variants = []
+        for i, (flavor, available) in enumerate(zip(product["flavors"], self.stock(index))):
+            variant = {
+                "id": product["id"] * 100 + i,
+                "title": flavor,
+                "option1": flavor,
+                "available": available,
+                "price": product["price"] if cents else f"{product['price'] / 100:.2f}",
+            }
+            if self.site == "drsmoke":
+                variant["inventory_quantity"] = 5 + i if available else 0
+            variants.append(variant)
+        return product, variants
+
+    def product_js(self, index):
+        product, variants = self.variants_json(index, cents=True)
+        return {
+            "id": product["id"],
+            "title": product["title"],
+            "handle": product["handle"],
+            "price": product["price"],
+            "variants": variants,
+        }
+
+    def catalog_page(self, limit, page):
+        start = (page - 1) * limit
+        products = []
+        for index in range(max(0, start), min(self.count, start + limit)):
+            product, variants = self.variants_json(index, cents=False)
+            products.append({
+                "id": product["id"],
+                "title": product["title"],
+                "handle": product["handle"],
+                "variants": variants,
+            })
+        return {"products": products}
+
+    def product_html(self, index):
+        product = self.product(index)
+        stock = self.stock(index)
+        price = f"${product['price'] / 100:.2f}"
+        title = f"<title>{product['title']} | {SITES[self.site]['title']}</title>"
+        # Filler so pages are roughly the size of a real theme's
+        filler = "<script>var theme = {};</script>" + "<div class='nav'><a href='/'>Home</a></div>" * 200
+
+        if self.site == "vaporhatch":
+            inputs = "".join(
+                f'<input type="radio" name="Flavor" value="{flavor}"{"" if available else " class=disabled"}>'
+                f"<label>{flavor}</label>"
+                for flavor, available in zip(product["flavors"], stock)
+            )
+            body = (
+                f'<fieldset class="js product-form__input">{inputs}</fieldset>'
+                f'<span class="price-item price-item--regular">{price}</span>'
+            )
+        else:
+            options = "".join(
+                f'<option value="{flavor}"{"" if available else " disabled"}>{flavor}</option>'
+                for flavor, available in zip(product["flavors"], stock)
+            )
+            count = sum(5 + i for i, available in enumerate(stock) if available)
+            body = (
+                f'<h1 class="h2 product-single__title">{product["title"]}</h1>'
+                f'<select class="variant__input-{product["id"]}">{options}</select>'
+                f'<div id="ProductInventory-{product["id"]}">{count} in stock</div>'
+                f'<span class="product__price">{price}</span>'
+            )
+        return f"<html><head>{title}{filler}</head><body>{body}{filler}</body></html>"
+
+# ==========================
+# SERVER
+# ==========================
+
+def get_catalog(request):
+    host = request.host.lower()
+    return request.app["catalogs"]["drsmoke" if "drsmoke" in host else "vaporhatch"]
+
+def count(request, endpoint, status):
+    key = f"{endpoint} {status}"
+    stats = request.app["stats"]
+    stats[key] = stats.get(key, 0) + 1
+
+def respond(request, endpoint, text, content_type):
+    """Answer with ETag handling according to --etag"""
+    mode = request.app["options"].etag
+    headers = {}
+    if mode != "none":
+        etag = '"' + hashlib.sha1(text.encode()).hexdigest()[:16] + '"'
+        headers["ETag"] = etag
+        if mode == "honor" and request.headers.get("If-None-Match") == etag:
+            count(request, endpoint, 304)
+            return web.Response(status=304, headers=headers)
+    count(request, endpoint, 200)
+    return web.Response(text=text, content_type=content_type, headers=headers)
+
+@web.middleware
+async def simulate_network(request, handler):
+    """Add latency and the configured share of 503 / 429 answers"""
+    options = request.app["options"]
+    if options.latency or options.jitter:
+        await asyncio.sleep(max(0.0, random.gauss(options.latency, options.jitter)))
+    if request.path != "/_stats":
+        roll = random.random()
+        if roll < options.error_rate:
+            count(request, "error", 503)
+            return web.Response(status=503, text="Service Unavailable")
+        if roll < options.error_rate + options.throttle_rate:
+            count(request, "throttle", 429)
+            return web.Response(status=429, text="Too Many Requests", headers={"Retry-After": "5"})
+    return await handler(request)
+
+async def handle_product(request):
+    catalog = get_catalog(request)
+    handle = request.match_info["handle"]
+    if handle.endswith(".js"):
+        index = catalog.index_of(handle[:-3])
+        if index is None:
+            count(request, "json", 404)
+            raise web.HTTPNotFound()
+        return respond(request, "json", json.dumps(catalog.product_js(index)), "application/javascript")
+    index = catalog.index_of(handle)
+    if index is None:
+        count(request, "page", 404)
+        raise web.HTTPNotFound()
+    return respond(request, "page", catalog.product_html(index), "text/html")
+
+async def handle_catalog(request):
+    catalog = get_catalog(request)
+    try:
+        limit = min(250, int(request.query.get("limit", "30")))
+        page = max(1, int(request.query.get("page", "1")))
+    except ValueError:
+        raise web.HTTPBadRequest()
+    return respond(request, "catalog", json.dumps(catalog.catalog_page(limit, page)), "application/json")
+
+async def handle_stats(request):
+    return web.json_response(request.app["stats"])
+
+def make_app(options):
+    app = web.Application(middlewares=[simulate_network])
+    app["options"] = options
+    app["stats"] = {}
+    app["catalogs"] = {
+        site: Catalog(site, options.products, options.variants, options.flap, options.flap_seconds, options.seed)
+        for site in SITES
+    }
+    app.router.add_get("/products.json", handle_catalog)
+    app.router.add_get("/products/{handle}", handle_product)
+    app.router.add_get("/_stats", handle_stats)
+    return app
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Shopify storefronts for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--products", type=int, default=1000, help="Products per site")
+    parser.add_argument("--variants", type=int, default=8, help="Flavors per product")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean seconds added to every answer")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Standard deviation of the added latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered 429")
+    parser.add_argument("--flap", type=float, default=0.02, help="Chance a variant flips stock each flap period")
+    parser.add_argument("--flap-seconds", type=float, default=1.0, help="Length of a flap period (0 = never flap)")
+    parser.add_argument("--etag", choices=["honor", "ignore", "none"], default="honor")
+    parser.add_argument("--seed", default="vaporhatch")
+    return parser.parse_args(argv)
+
+def main():
+    options = parse_args()
+    print(f"Fake stores with {options.products} products each on http://{options.host}:{options.port}", flush=True)
+    web.run_app(make_app(options), host=options.host, port=options.port, print=None, access_log=None)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""Load test the stock checker against the local fake storefronts.
+
+Starts loadtest/fake_store.py, then for every size runs a fresh process that
+fills PRODUCTS with that many products pointing at it (half per site), runs
+the bot's check_stock_loop sweeps with alerts going to a mocked Discord
+channel, and reports how the sweeps hold up:
+
+    python loadtest/run_loadtest.py                          # 100, 500, 1000, 2000 products
+    python loadtest/run_loadtest.py --sizes 1000,5000 --sweeps 10
+    python loadtest/run_loadtest.py --no-bulk --store-args "--etag ignore --error-rate 0.02"
+    python loadtest/run_loadtest.py --store-url http://127.0.0.1:8800 --json report.json
+
+By default every product is checked on every sweep (--adaptive keeps the
+scheduler and request budget). Nothing leaves the machine: vaporhatch.com
+and drsmoke.com resolve to the fake store.
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import socket
+import asyncio
+import argparse
+import contextlib
+import tempfile
+import subprocess
+import urllib.request
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(LOADTEST_DIR)
+FAKE_STORE = os.path.join(LOADTEST_DIR, "fake_store.py")
+
+sys.path.insert(0, REPO_DIR)
+
+# ==========================
+# MEASUREMENT
+# ==========================
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+def rss_mb():
+    """Current resident memory of this process, falling back to the peak"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+async def sample_loop_lag(samples, interval=0.01):
+    """Record how late every short sleep wakes up"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+class MockChannel:
+    """Stands in for a Discord channel or user: counts messages after a fake round trip"""
+
+    def __init__(self, latency, sent):
+        self.latency = latency
+        self.sent = sent
+
+    async def send(self, text):
+        await asyncio.sleep(self.latency)
+        self.sent.append((time.monotonic(), len(text)))
+
+# ==========================
+# ONE RUN
+# ==========================
+
+def make_resolver(address):
+    """aiohttp resolver sending every host to the fake store"""
+    from aiohttp.abc import AbstractResolver
+
+    class LocalResolver(AbstractResolver):
+        async def resolve(self, host, port=0, family=socket.AF_INET):
+            return [{
+                "hostname": host, "host": address, "port": port,
+                "family": socket.AF_INET, "proto": 0, "flags": socket.AI_NUMERICHOST,
+            }]
+
+        async def close(self):
+            pass
+
+    return LocalResolver()
+
+def fill_products(scraper, size, port):
+    """Replace PRODUCTS with ``size`` products split across both fake sites"""
+    scraper.PRODUCTS.clear()
+    for index in range(size):
+        site = "vaporhatch" if index % 2 == 0 else "drsmoke"
+        url = f"http://{site}.com:{port}/products/lt-{index // 2:05d}"
+        scraper.PRODUCTS[f"lt{index}"] = {
+            "name": f"Load test {index}",
+            "url": url,
+            "site": site,
+            "last_stock": set(),
+            "initialized": False,
+            "is_custom": True,
+        }
+
+async def run_size(args):
+    # Imported here so the state database points at a scratch file first
+    import fetcher
+    import dispatch
+    import metrics
+    import scraper
+    import stockbot
+
+    address, port = args.store_host, args.store_port
+    fetcher.RESOLVER = make_resolver(address)
+    scraper.BULK_POLLING = not args.no_bulk
+    scraper.SHOPIFY_JSON_FIRST = not args.html
+    # Sweeps here are seconds apart, the snapshot cache would answer all but the first
+    scraper.SNAPSHOT_TTL = 0
+    if args.parse_workers is not None:
+        scraper.PARSE_WORKERS = args.parse_workers
+    if args.concurrency:
+        scraper.SWEEP_CONCURRENCY = args.concurrency
+    if args.site_concurrency:
+        for site in scraper.SITE_CONCURRENCY:
+            scraper.SITE_CONCURRENCY[site] = args.site_concurrency
+        scraper.DEFAULT_SITE_CONCURRENCY = args.site_concurrency
+    if not args.adaptive:
+        # Every product on every sweep, however many requests that takes
+        scraper.REQUEST_BUDGET_PER_MINUTE = 10 ** 9
+        scraper.REQUEST_BUDGET["tokens"] = float(scraper.REQUEST_BUDGET_PER_MINUTE)
+    fill_products(scraper, args.run, port)
+
+    sent = []
+    channel = MockChannel(args.send_latency, sent)
+    stockbot.bot.get_channel = lambda channel_id: channel
+    stockbot.bot.get_user = lambda user_id: channel
+
+    lag = []
+    lag_task = asyncio.ensure_future(sample_loop_lag(lag))
+    rss_before = rss_mb()
+    sweeps = []
+    started = time.monotonic()
+    try:
+        for number in range(args.sweeps):
+            if not args.adaptive:
+                for product_id in scraper.PRODUCTS:
+                    scraper.schedule_product(product_id, 0)
+            alerts_before = dispatch.DISPATCH_STATS["alerts"]
+            requests_before = metrics.total("requests_total")
+            lag_before = len(lag)
+
+            sweep_start = time.monotonic()
+            await stockbot.check_stock_loop()
+            duration = time.monotonic() - sweep_start
+
+            sweep_lag = lag[lag_before:]
+            sweeps.append({
+                "sweep": number + 1,
+                "seconds": duration,
+                "checked": scraper.SWEEP_STATS["last_products"],
+                "alerts": dispatch.DISPATCH_STATS["alerts"] - alerts_before,
+                "requests": metrics.total("requests_total") - requests_before,
+                "lag_max_ms": max(sweep_lag, default=0.0) * 1000,
+            })
+            await asyncio.sleep(args.interval)
+
+        # Let the per-channel rate limit drain what it can before counting deliveries
+        deadline = time.monotonic() + args.drain_seconds
+        while dispatch.queue_depth() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+    finally:
+        lag_task.cancel()
+        elapsed = time.monotonic() - started
+        scraper.shutdown_parse_pool()
+        await fetcher.close()
+
+    timed = sweeps[1:] or sweeps  # the first sweep only initializes stock
+    durations = [s["seconds"] for s in timed]
+    alerts = sum(s["alerts"] for s in sweeps)
+    sweep_p50 = percentile(durations, 50)
+    return {
+        "products": args.run,
+        "sweeps": sweeps,
+        "sweep_p50_s": sweep_p50,
+        "sweep_max_s": max(durations, default=0.0),
+        "first_sweep_s": sweeps[0]["seconds"] if sweeps else 0.0,
+        "products_per_s": args.run / sweep_p50 if sweep_p50 else 0.0,
+        "alerts": alerts,
+        "alerts_per_s": alerts / elapsed if elapsed else 0.0,
+        "messages_sent": len(sent),
+        "queue_depth": dispatch.queue_depth(),
+        "requests": metrics.total("requests_total"),
+        "not_modified": metrics.total("requests_total", status="304"),
+        "fetch_errors": metrics.total("fetch_errors_total"),
+        "rss_mb": rss_mb(),
+        "rss_growth_mb": rss_mb() - rss_before,
+        "lag_p50_ms": percentile(lag, 50) * 1000,
+        "lag_p99_ms": percentile(lag, 99) * 1000,
+        "lag_max_ms": max(lag, default=0.0) * 1000,
+    }
+
+# ==========================
+# ORCHESTRATION
+# ==========================
+
+def wait_for_store(url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/_stats", timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def start_store(args, max_size):
+    """Launch the fake store sized for the largest run; returns (process, url)"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    command = [
+        sys.executable, FAKE_STORE, "--port", str(port),
+        "--products", str((max_size + 1) // 2),
+    ] + shlex.split(args.store_args)
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    if not wait_for_store(url):
+        process.terminate()
+        raise RuntimeError("fake store did not start")
+    return process, url
+
+def run_child(args, size, store_url):
+    """Run one size in a fresh interpreter so memory numbers don't carry over"""
+    host, port = store_url.split("://", 1)[1].rsplit(":", 1)
+    command = [
+        sys.executable, os.path.abspath(__file__), "--run", str(size),
+        "--store-host", host, "--store-port", port,
+        "--sweeps", str(args.sweeps), "--interval", str(args.interval),
+        "--send-latency", str(args.send_latency), "--drain-seconds", str(args.drain_seconds),
+    ]
+    for flag in ("adaptive", "no_bulk", "html"):
+        if getattr(args, flag):
+            command.append("--" + flag.replace("_", "-"))
+    for flag in ("concurrency", "site_concurrency", "parse_workers"):
+        if getattr(args, flag) is not None:
+            command += ["--" + flag.replace("_", "-"), str(getattr(args, flag))]
+
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, STATE_DB_FILE=os.path.join(scratch, "state.db"), METRICS_PORT="0")
+        result = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL if not args.verbose else None)
+    if result.returncode != 0:
+        raise RuntimeError(f"run with {size} products failed (rerun with --verbose)")
+    return json.loads(result.stdout.decode().strip().splitlines()[-1])
+
+def print_report(reports):
+    header = (
+        f"{'products':>8} {'first s':>8} {'sweep p50':>9} {'sweep max':>9} {'prod/s':>8} "
+        f"{'alerts/s':>8} {'sent':>6} {'queued':>6} {'reqs':>7} {'304':>6} {'errors':>6} "
+        f"{'RSS MB':>7} {'+MB':>6} {'lag p99':>8} {'lag max':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        print(
+            f"{r['products']:>8} {r['first_sweep_s']:>8.2f} {r['sweep_p50_s']:>9.2f} {r['sweep_max_s']:>9.2f} "
+            f"{r['products_per_s']:>8.0f} {r['alerts_per_s']:>8.1f} {r['messages_sent']:>6} {r['queue_depth']:>6} "
+            f"{r['requests']:>7} {r['not_modified']:>6} {r['fetch_errors']:>6} {r['rss_mb']:>7.1f} "
+            f"{r['rss_growth_mb']:>6.1f} {r['lag_p99_ms']:>6.1f}ms {r['lag_max_ms']:>6.1f}ms"
+        )
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Load test sweeps against fake storefronts")
+    parser.add_argument("--sizes", default="100,500,1000,2000", help="Comma separated product counts")
+    parser.add_argument("--sweeps", type=int, default=5, help="Sweeps per size (the first only initializes)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between sweeps")
+    parser.add_argument("--send-latency", type=float, default=0.05, help="Mock Discord send time")
+    parser.add_argument("--drain-seconds", type=float, default=5.0, help="Max wait for queued alerts after the sweeps")
+    parser.add_argument("--adaptive", action="store_true", help="Keep the adaptive schedule and request budget")
+    parser.add_argument("--no-bulk", action="store_true", help="Fetch every product on its own")
+    parser.add_argument("--html", action="store_true", help="Parse HTML pages instead of Shopify JSON")
+    parser.add_argument("--concurrency", type=int, help="Max pages fetched at once")
+    parser.add_argument("--site-concurrency", type=int, help="Max pages fetched at once per site")
+    parser.add_argument("--parse-workers", type=int, help="Parse pool size (0 parses on the event loop)")
+    parser.add_argument("--store-url", help="Use an already running fake store instead of starting one")
+    parser.add_argument("--store-args", default="", help="Extra fake_store.py options, e.g. \"--error-rate 0.01\"")
+    parser.add_argument("--json", dest="json_out", help="Write the reports to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the runs' logs")
+    # Internal: a single run, reported as one JSON line
+    parser.add_argument("--run", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--store-host", help=argparse.SUPPRESS)
+    parser.add_argument("--store-port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        # Logs to stderr, the report is the last line on stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            report = asyncio.run(run_size(args))
+        print(json.dumps(report))
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    process = None
+    store_url = args.store_url
+    if not store_url:
+        process, store_url = start_store(args, max(sizes))
+    try:
+        reports = []
+        for size in sizes:
+            reports.append(run_child(args, size, store_url))
+            print(f"{size} products done", file=sys.stderr)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    print_report(reports)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"sizes": sizes, "reports": reports}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,265 @@
+import os
+import time
+import asyncio
+from contextlib import contextmanager
+from aiohttp import web
+
+# ==========================
+# CONFIG
+# ==========================
+
+# Local Prometheus endpoint (http://127.0.0.1:9108/metrics); 0 turns it off
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9108"))
+
+PREFIX = "vaporhatch_"
+
+# Seconds; covers sub-millisecond parses up to a slow full sweep
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# ==========================
+# REGISTRY
+# ==========================
+
+# name -> {"kind", "help", "buckets"}
+METRICS = {}
+
+# name -> {labels tuple: value} for counters and gauges
+# name -> {labels tuple: {"buckets": [counts], "sum", "count"}} for histograms
+VALUES = {}
+
+# Called at scrape time, each returns [(name, labels dict, value)] for gauges
+COLLECTORS = []
+
+_server = None
+_lag_task = None
+
+def declare(name, kind, help_text, buckets=DEFAULT_BUCKETS):
+    METRICS[name] = {"kind": kind, "help": help_text, "buckets": buckets}
+    VALUES.setdefault(name, {})
+
+declare("fetch_seconds", "histogram", "HTTP request time by host")
+declare("requests_total", "counter", "HTTP requests by host and status")
+declare("response_bytes_total", "counter", "Decoded response bytes by host")
+declare("fetch_errors_total", "counter", "Failed HTTP requests by host and error type")
+declare("parse_seconds", "histogram", "Time spent parsing a page or JSON document by site and source")
+declare("diff_seconds", "histogram", "Time spent diffing a snapshot against stored stock by site")
+declare("dispatch_send_seconds", "histogram", "Time one alert message send took")
+declare("dispatch_latency_seconds", "histogram", "Time from a stock change to its alert being delivered")
+declare("alerts_total", "counter", "Alert messages by result")
+declare("sweep_seconds", "histogram", "Duration of one scheduler tick's checks")
+declare("sweep_products_total", "counter", "Products checked by sweeps")
+declare("command_seconds", "histogram", "Slash command handling time by command")
+declare("event_loop_lag_seconds", "histogram", "How late the event loop woke a sleeping task",
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5))
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    """Add to a counter"""
+    values = VALUES[name]
+    key = label_key(labels)
+    values[key] = values.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """Record one histogram sample"""
+    values = VALUES[name]
+    key = label_key(labels)
+    series = values.get(key)
+    if series is None:
+        series = {"buckets": [0] * len(METRICS[name]["buckets"]), "sum": 0.0, "count": 0}
+        values[key] = series
+    for i, bound in enumerate(METRICS[name]["buckets"]):
+        if value <= bound:
+            series["buckets"][i] += 1
+            break
+    series["sum"] += value
+    series["count"] += 1
+
+@contextmanager
+def timer(name, **labels):
+    """Observe how long the ``with`` block took"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def register_collector(func):
+    """Add a callable returning [(name, labels, value)] gauges, evaluated on every scrape"""
+    COLLECTORS.append(func)
+
+# ==========================
+# QUERIES
+# ==========================
+
+def matching_series(name, labels):
+    """Series of a metric whose labels include ``labels``"""
+    wanted = set(labels.items())
+    return [series for key, series in VALUES.get(name, {}).items() if wanted.issubset(key)]
+
+def total(name, **labels):
+    """Counter total over every series matching ``labels``"""
+    return sum(matching_series(name, labels))
+
+def histogram_stats(name, **labels):
+    """(count, mean, p50, p95) merged over matching series; percentiles are bucket upper bounds"""
+    bounds = METRICS[name]["buckets"]
+    counts = [0] * len(bounds)
+    count = 0
+    total_sum = 0.0
+    for series in matching_series(name, labels):
+        counts = [a + b for a, b in zip(counts, series["buckets"])]
+        count += series["count"]
+        total_sum += series["sum"]
+    if not count:
+        return 0, None, None, None
+
+    def percentile(q):
+        target = q * count
+        running = 0
+        for bound, n in zip(bounds, counts):
+            running += n
+            if running >= target:
+                return bound
+        # Beyond the largest bucket
+        return float("inf")
+
+    return count, total_sum / count, percentile(0.5), percentile(0.95)
+
+def label_values(name, label):
+    """Distinct values of one label across a metric's series"""
+    return sorted({value for key in VALUES.get(name, {}) for k, value in key if k == label})
+
+# ==========================
+# FORWARDING
+# ==========================
+
+# name -> {labels tuple: value} as of the last export_changes() call
+_exported = {}
+
+def export_changes():
+    """Counter and histogram changes since the last call, as JSON friendly [name, labels, change]
+
+    Scraper workers send these to the bot, which adds them with merge_changes().
+    """
+    changes = []
+    for name, values in VALUES.items():
+        histogram = METRICS[name]["kind"] == "histogram"
+        exported = _exported.setdefault(name, {})
+        for key, value in values.items():
+            previous = exported.get(key)
+            if histogram:
+                if previous is not None and previous["count"] == value["count"]:
+                    continue
+                previous = previous or {"buckets": [0] * len(value["buckets"]), "sum": 0.0, "count": 0}
+                change = {
+                    "buckets": [now - before for now, before in zip(value["buckets"], previous["buckets"])],
+                    "sum": value["sum"] - previous["sum"],
+                    "count": value["count"] - previous["count"],
+                }
+                exported[key] = {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+            else:
+                if value == (previous or 0):
+                    continue
+                change = value - (previous or 0)
+                exported[key] = value
+            changes.append([name, [list(item) for item in key], change])
+    return changes
+
+def merge_changes(changes):
+    """Add changes exported by another process to this process's metrics"""
+    for name, labels, change in changes:
+        meta = METRICS.get(name)
+        if meta is None:
+            continue
+        key = tuple(tuple(item) for item in labels)
+        values = VALUES[name]
+        if meta["kind"] != "histogram":
+            values[key] = values.get(key, 0) + change
+            continue
+        series = values.get(key)
+        if series is None:
+            series = {"buckets": [0] * len(meta["buckets"]), "sum": 0.0, "count": 0}
+            values[key] = series
+        series["buckets"] = [a + b for a, b in zip(series["buckets"], change["buckets"])]
+        series["sum"] += change["sum"]
+        series["count"] += change["count"]
+
+# ==========================
+# EXPORT
+# ==========================
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+def render():
+    """Everything in the Prometheus text exposition format"""
+    lines = []
+    for name, meta in METRICS.items():
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {meta['help']}")
+        lines.append(f"# TYPE {full} {meta['kind']}")
+        for key, value in VALUES[name].items():
+            if meta["kind"] != "histogram":
+                lines.append(f"{full}{format_labels(key)} {value}")
+                continue
+            running = 0
+            for bound, n in zip(meta["buckets"], value["buckets"]):
+                running += n
+                lines.append(f"{full}_bucket{format_labels(key + (('le', bound),))} {running}")
+            lines.append(f"{full}_bucket{format_labels(key + (('le', '+Inf'),))} {value['count']}")
+            lines.append(f"{full}_sum{format_labels(key)} {value['sum']}")
+            lines.append(f"{full}_count{format_labels(key)} {value['count']}")
+
+    gauges = {}
+    for collector in COLLECTORS:
+        try:
+            for name, labels, value in collector():
+                gauges.setdefault(name, []).append((label_key(labels), value))
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+    for name, samples in gauges.items():
+        lines.append(f"# TYPE {PREFIX}{name} gauge")
+        for key, value in samples:
+            lines.append(f"{PREFIX}{name}{format_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+async def handle_metrics(request):
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+async def start_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics on a local port (once; no-op when the port is 0)"""
+    global _server
+    if _server is not None or not port:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        print(f"Metrics endpoint disabled, can't listen on {host}:{port}: {e}")
+        await runner.cleanup()
+        return
+    _server = runner
+    print(f"Metrics on http://{host}:{port}/metrics")
+
+async def measure_loop_lag(interval=1.0):
+    """Sleep in a loop and record how late each wake-up is"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        observe("event_loop_lag_seconds", max(0.0, time.perf_counter() - start - interval))
+
+def start_lag_monitor():
+    global _lag_task
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.ensure_future(measure_loop_lag())
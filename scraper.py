@@ -0,0 +1,1487 @@
+import os
+import json
+import time
+import re
+import hashlib
+import asyncio
+import heapq
+import bisect
+import random
+import urllib.parse
+import multiprocessing
+import concurrent.futures
+from collections import namedtuple
+from bs4 import BeautifulSoup
+import fetcher
+import store
+import history
+import dispatch
+import search
+import metrics
+
+# ==========================
+# CONFIG
+# ==========================
+
+# Legacy custom products file, imported into the state store (store.STATE_DB_FILE) once
+CUSTOM_PRODUCTS_FILE = "custom_products.json"
+
+# Off for standalone CLI runs on the bot's database: they read its products and
+# last stock but must not move its saved state forward or repeat its history
+PERSIST_STATE = True
+
+# Default time between checks of a product; the scheduler adapts it per product
+STOCK_CHECK_MINUTES = 5
+
+# Adaptive scheduler: products that just changed are checked every MIN_CHECK_SECONDS,
+# quiet ones back off by CHECK_BACKOFF each check up to MAX_CHECK_SECONDS
+SCHEDULER_TICK_SECONDS = 15
+MIN_CHECK_SECONDS = int(os.environ.get("MIN_CHECK_SECONDS", "60"))
+MAX_CHECK_SECONDS = int(os.environ.get("MAX_CHECK_SECONDS", "3600"))
+CHECK_BACKOFF = 1.5
+CHECK_JITTER = 0.1  # +/- fraction applied to every interval
+REQUEST_BUDGET_PER_MINUTE = int(os.environ.get("REQUEST_BUDGET_PER_MINUTE", "120"))
+
+# Read Shopify's /products/<handle>.js endpoint before falling back to HTML scraping
+SHOPIFY_JSON_FIRST = os.environ.get("SHOPIFY_JSON_FIRST", "1") != "0"
+
+# Poll a whole store's /products.json listing instead of one request per product
+# once at least BULK_MIN_PRODUCTS products from that store are watched
+BULK_POLLING = os.environ.get("BULK_POLLING", "1") != "0"
+BULK_MIN_PRODUCTS = int(os.environ.get("BULK_MIN_PRODUCTS", "5"))
+BULK_PAGE_SIZE = 250  # Shopify's maximum page size
+BULK_MAX_PAGES = int(os.environ.get("BULK_MAX_PAGES", "20"))
+
+# How long a fetched snapshot answers /stock, /stockurl and the loop without refetching
+SNAPSHOT_TTL = float(os.environ.get("SNAPSHOT_TTL", "30"))
+
+# Processes that decode, extract and parse product pages off the event loop (0 does it
+# inline), how many pages may be handed to them at once before callers wait, and the
+# smallest raw page worth the round trip (real theme pages are 100 KB and more)
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "2"))
+PARSE_QUEUE_LIMIT = int(os.environ.get("PARSE_QUEUE_LIMIT", str(max(1, PARSE_WORKERS) * 2)))
+PARSE_OFFLOAD_MIN_BYTES = int(os.environ.get("PARSE_OFFLOAD_MIN_BYTES", "8192"))
+
+# Max pages fetched at once during a sweep, overall and per site
+SWEEP_CONCURRENCY = int(os.environ.get("SWEEP_CONCURRENCY", "10"))
+SITE_CONCURRENCY = {
+    "vaporhatch": int(os.environ.get("VAPORHATCH_CONCURRENCY", "4")),
+    "drsmoke": int(os.environ.get("DRSMOKE_CONCURRENCY", "4")),
+}
+DEFAULT_SITE_CONCURRENCY = 2
+
+# More Shopify stores read like VaporHatch (same theme markup), as "site=host,host;site=host"
+EXTRA_SHOPIFY_SITES = os.environ.get("EXTRA_SHOPIFY_SITES", "")
+
+# Default products
+PRODUCTS = {
+    "fogerkit": {
+        "name": "Foger Switch Pro 30K KIT",
+        "url": "https://www.vaporhatch.com/products/foger-switch-pro-30k?variant=49948988866856",
+        "last_stock": set(),
+        "initialized": False,
+        "is_custom": False,
+        "site": "vaporhatch"
+    },
+    "herox": {
+        "name": "Hero X 30K",
+        "url": "https://www.vaporhatch.com/products/hero-x-coming-soon?variant=49127221395752",
+        "last_stock": set(),
+        "initialized": False,
+        "is_custom": False,
+        "site": "vaporhatch"
+    },
+    "raztn9000": {
+        "name": "RAZ TN9000",
+        "url": "https://www.vaporhatch.com/products/raz-tn9000-1",
+        "last_stock": set(),
+        "initialized": False,
+        "is_custom": False,
+        "site": "vaporhatch"
+    },
+    "fogerpod": {
+        "name": "Foger Switch Pro 30K POD",
+        "url": "https://www.vaporhatch.com/products/foger-switch-pro-30k-pod?variant=50326308421928",
+        "last_stock": set(),
+        "initialized": False,
+        "is_custom": False,
+        "site": "vaporhatch"
+    },
+    "geekbar": {
+        "name": "Geek Bar Pulse 15000",
+        "url": "https://www.vaporhatch.com/products/geek-bar-pulse-disposable-vape-15000-puffs",
+        "last_stock": set(),
+        "initialized": False,
+        "is_custom": False,
+        "site": "vaporhatch"
+    }
+}
+
+# ==========================
+# DATA MANAGEMENT
+# ==========================
+
+def import_custom_products_json():
+    """One-time migration of custom_products.json into the state store"""
+    with open(CUSTOM_PRODUCTS_FILE, 'r') as f:
+        custom_products = json.load(f)
+
+    states = []
+    for key, product in custom_products.items():
+        # Ensure site is set
+        if "site" not in product:
+            route_product(product)
+        store.save_product(key, product)
+        if product.get("initialized", False):
+            states.append((key, set(product.get("last_stock", [])), None, True, time.time()))
+    store.save_states(states)
+    print(f"Imported {len(custom_products)} custom products from {CUSTOM_PRODUCTS_FILE}")
+
+def load_custom_products():
+    """Load custom products and every product's last known stock from the state store"""
+    try:
+        if not store.has_products() and os.path.exists(CUSTOM_PRODUCTS_FILE):
+            import_custom_products_json()
+
+        custom_products = store.load_products()
+        for key, product in custom_products.items():
+            route_product(product)
+            product["last_stock"] = set()
+            product["initialized"] = False
+            product["is_custom"] = True
+            PRODUCTS[key] = product
+        print(f"Loaded {len(custom_products)} custom products")
+
+        # Warm start: restored products diff against their pre-restart stock
+        restored = 0
+        for key, state in store.load_states().items():
+            if key in PRODUCTS:
+                PRODUCTS[key]["last_stock"] = state["last_stock"]
+                PRODUCTS[key]["initialized"] = state["initialized"]
+                # Rows saved before prices were normalized read "$19.99 USD"
+                PRODUCTS[key]["last_price"] = normalize_price(state["price"]) if state["price"] else None
+                restored += 1
+        print(f"Restored stock state for {restored} products")
+    except Exception as e:
+        print(f"Error loading custom products: {e}")
+
+    for key, product in PRODUCTS.items():
+        search.index_product(key, product["name"], product["last_stock"])
+
+def generate_product_key(url):
+    """Generate a unique key for a product based on URL"""
+    return hashlib.md5(url.encode()).hexdigest()[:8]
+
+async def get_product_name_from_url(url):
+    """Extract product name from URL or page title"""
+    snapshot = await get_cached_snapshot(url)
+    if snapshot and snapshot.name:
+        return snapshot.name
+    return get_name_from_url_path(url, min_parts=2) or "Custom Product"
+
+def get_name_from_url_path(url, min_parts=1):
+    """Convert the last segment of the URL path into a readable name"""
+    path = urllib.parse.urlparse(url).path
+    if path:
+        parts = path.strip('/').split('/')
+        if parts and len(parts) >= min_parts and parts[-1]:
+            product_slug = parts[-1]
+            # Convert slug to readable name
+            return product_slug.replace('-', ' ').title()
+    return None
+
+# ==========================
+# PRODUCT SNAPSHOTS
+# ==========================
+
+# Everything we know about a product page from a single fetch and a single parse
+ProductSnapshot = namedtuple(
+    "ProductSnapshot",
+    ["url", "site", "name", "flavors", "price", "inventory_count"]
+)
+
+# Last snapshot built from each fetched URL, reused while the page is unchanged
+SNAPSHOT_MEMO = {}
+SNAPSHOT_MEMO_LIMIT = 5000
+
+def remember_snapshot(key, snapshot):
+    """Keep the snapshot parsed from ``key`` so an unchanged fetch can reuse it"""
+    SNAPSHOT_MEMO.pop(key, None)
+    if len(SNAPSHOT_MEMO) >= SNAPSHOT_MEMO_LIMIT:
+        SNAPSHOT_MEMO.pop(next(iter(SNAPSHOT_MEMO)))
+    SNAPSHOT_MEMO[key] = snapshot
+
+# ==========================
+# FAST EXTRACTION
+# ==========================
+
+# Only these regions of a product page are handed to BeautifulSoup. Comments and
+# <script>/<style> bodies are raw text to html.parser, so matches inside them are ignored.
+FAST_PARSE = os.environ.get("FAST_PARSE", "1") != "0"
+SKIPPED_REGIONS = re.compile(r'<!--.*?-->|<(script|style)\b[^>]*>.*?</\1\s*>', re.S | re.I)
+
+def compile_page_regions(elements):
+    """Precompile (tag, hints) pairs into opening/any-tag regexes
+
+    An element is a candidate when its opening tag contains one of the hints,
+    which must be a superset of what the parser's own selectors accept.
+    """
+    compiled = []
+    for tag, hints in elements:
+        hint = "(?:" + "|".join(re.escape(h) for h in hints) + ")" if hints else ""
+        opening = re.compile(rf'<{tag}\b[^>]*{hint}[^>]*>' if hint else rf'<{tag}\b[^>]*>', re.I)
+        any_tag = re.compile(rf'<(/?){tag}\b[^>]*>', re.I)
+        compiled.append((opening, any_tag))
+    return compiled
+
+def find_element_end(html, any_tag, start):
+    """Index just past the tag that closes the element opened right before ``start``"""
+    depth = 1
+    for m in any_tag.finditer(html, start):
+        if m.group(1):
+            depth -= 1
+            if depth == 0:
+                return m.end()
+        elif not m.group(0).endswith("/>"):
+            depth += 1
+    # Unclosed: html.parser closes it at the end of the document
+    return len(html)
+
+def extract_page_regions(html, regions):
+    """Return just the candidate elements of a page, in document order"""
+    skipped = [(m.start(), m.end()) for m in SKIPPED_REGIONS.finditer(html)]
+    skipped_starts = [s for s, _ in skipped]
+
+    found = []
+    for opening, any_tag in regions:
+        for m in opening.finditer(html):
+            index = bisect.bisect_right(skipped_starts, m.start()) - 1
+            if index >= 0 and m.start() < skipped[index][1]:
+                continue
+            end = m.end() if m.group(0).endswith("/>") else find_element_end(html, any_tag, m.end())
+            found.append((m.start(), end))
+
+    found.sort()
+    pieces = []
+    last_end = -1
+    for start, end in found:
+        # Nested candidates are already inside their parent's region
+        if start < last_end:
+            continue
+        pieces.append(html[start:end])
+        last_end = end
+    return "".join(pieces)
+
+def make_product_soup(html, regions, extracted=False):
+    """BeautifulSoup over only the regions a scraper reads (or the whole page with FAST_PARSE=0)
+
+    ``extracted`` says ``html`` already is extract_page_regions() output.
+    """
+    if FAST_PARSE and not extracted:
+        html = extract_page_regions(html, regions)
+    return BeautifulSoup(html, "html.parser")
+
+# ==========================
+# PARSE POOL
+# ==========================
+
+_parse_pool = None
+_parse_slots = None
+_parse_pool_starting = None
+
+PARSE_STATS = {"offloaded": 0, "inline": 0, "waited": 0, "in_flight": 0, "waiting": 0}
+
+def get_parse_pool():
+    """Process pool for page parsing, started on first use"""
+    global _parse_pool
+    if _parse_pool is None:
+        # forkserver children start from a clean process instead of forking the bot's threads
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["scraper"])
+        else:
+            context = multiprocessing.get_context()
+        _parse_pool = concurrent.futures.ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context)
+    return _parse_pool
+
+def warm_parse_pool():
+    """Create the pool and wait until its processes are up"""
+    pool = get_parse_pool()
+    for future in [pool.submit(len, "") for _ in range(PARSE_WORKERS)]:
+        future.result()
+    return pool
+
+async def start_parse_pool():
+    """Start the pool from a thread, since launching processes would stall the event loop"""
+    global _parse_pool_starting
+    # The pool exists before its processes do; submitting then would block on the spawn
+    if _parse_pool_starting is None or (_parse_pool is None and _parse_pool_starting.done()):
+        _parse_pool_starting = asyncio.ensure_future(asyncio.to_thread(warm_parse_pool))
+    return await asyncio.shield(_parse_pool_starting)
+
+def get_parse_slots():
+    global _parse_slots
+    if _parse_slots is None:
+        _parse_slots = asyncio.Semaphore(PARSE_QUEUE_LIMIT)
+    return _parse_slots
+
+def shutdown_parse_pool():
+    global _parse_pool, _parse_pool_starting
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+    _parse_pool_starting = None
+
+def parse_page(parse, regions, url, body, encoding, previous_digest=None):
+    """Decode a raw page, extract and hash its regions and parse them (runs in the parse pool)
+
+    Returns (digest, snapshot). The parse is skipped, with snapshot None, when
+    the regions hash to ``previous_digest``.
+    """
+    html = body.decode(encoding, errors="replace")
+    fragment = extract_page_regions(html, regions)
+    digest = fetcher.fragment_digest(fragment)
+    if digest == previous_digest:
+        return digest, None
+    if FAST_PARSE:
+        # The hashed fragment is exactly what the parser would cut out again
+        return digest, parse(url, fragment, extracted=True)
+    return digest, parse(url, html)
+
+async def run_parse(parse, regions, page, previous_digest=None):
+    """Run parse_page on a fetched RawPage in the parse pool, waiting for a slot when it is saturated
+
+    Small pages and PARSE_WORKERS=0 are handled inline, where the round trip would cost more.
+    """
+    args = (parse, regions, page.url, page.body, page.encoding, previous_digest)
+    if PARSE_WORKERS <= 0 or len(page.body) < PARSE_OFFLOAD_MIN_BYTES:
+        PARSE_STATS["inline"] += 1
+        return parse_page(*args)
+
+    slots = get_parse_slots()
+    if slots.locked():
+        # Backpressure: the caller still holds its fetch slot, so the sweep slows down too
+        PARSE_STATS["waited"] += 1
+    PARSE_STATS["waiting"] += 1
+    try:
+        await slots.acquire()
+    finally:
+        PARSE_STATS["waiting"] -= 1
+    PARSE_STATS["in_flight"] += 1
+    try:
+        pool = await start_parse_pool()
+        result = await asyncio.get_running_loop().run_in_executor(pool, parse_page, *args)
+        PARSE_STATS["offloaded"] += 1
+        return result
+    except (concurrent.futures.process.BrokenProcessPool, OSError) as e:
+        print(f"Parse pool failed, restarting it: {e}")
+        shutdown_parse_pool()
+        PARSE_STATS["inline"] += 1
+        return parse_page(*args)
+    finally:
+        PARSE_STATS["in_flight"] -= 1
+        slots.release()
+
+async def get_html_snapshot(url, site, parse, regions, timeout=15):
+    """Fetch a product page and parse it, skipping the parse when the relevant markup is unchanged"""
+    memo = SNAPSHOT_MEMO.get(url)
+    page = await fetcher.fetch_raw(url, timeout=timeout, conditional=True)
+    if page is fetcher.NOT_MODIFIED:
+        if memo is not None:
+            return memo
+        page = await fetcher.fetch_raw(url, timeout=timeout)
+
+    # Decoding, region extraction and hashing all happen next to the parse, off the event loop
+    previous = fetcher.get_digest(url) if memo is not None else None
+    with metrics.timer("parse_seconds", site=site, source="html"):
+        digest, snapshot = await run_parse(parse, regions, page, previous)
+    if memo is not None and digest == previous:
+        # Server ignored the validators but the markup we read is unchanged
+        fetcher.finish_conditional(page, digest)
+        return memo
+
+    if snapshot is None:
+        # A captcha or error page: its validators and digest must not vouch for the old snapshot
+        SNAPSHOT_MEMO.pop(url, None)
+        fetcher.forget(url)
+        print(f"No product form on {url}, stock unknown")
+        return None
+    fetcher.finish_conditional(page, digest)
+    if snapshot.site != site:
+        # Stores on the same theme share a parser
+        snapshot = snapshot._replace(site=site)
+    remember_snapshot(url, snapshot)
+    return snapshot
+
+def get_page_title(soup):
+    """Return the <title> text without the store suffix"""
+    title = soup.find('title')
+    if not title:
+        return None
+    name = title.text.strip()
+    # Clean up the title
+    if '|' in name:
+        name = name.split('|')[0].strip()
+    return name
+
+# Currency symbol (optional) and amount, e.g. "$19.99 USD", "Sale price$1,299.00"
+PRICE_PATTERN = re.compile(r"([$€£])?\s*(\d[\d,]*(?:\.\d+)?)")
+
+def normalize_price(text):
+    """Canonical "$19.99" form, so pages, product JSON and catalogs report the same price"""
+    if not text or text == "Unknown":
+        return "Unknown"
+    match = PRICE_PATTERN.search(text)
+    if not match:
+        return "Unknown"
+    try:
+        value = float(match.group(2).replace(",", ""))
+    except ValueError:
+        return "Unknown"
+    return f"{match.group(1) or '$'}{value:.2f}"
+
+def format_inventory_info(count):
+    """Human readable inventory text for messages"""
+    if count is not None:
+        return f"{count} in stock"
+    return ""
+
+# ==========================
+# SCRAPERS - SHOPIFY JSON
+# ==========================
+
+def get_product_handle(url):
+    """Extract the Shopify product handle from a product page URL"""
+    parts = urllib.parse.urlparse(url).path.strip('/').split('/')
+    # Works for /products/<handle> and /collections/<name>/products/<handle>
+    if "products" not in parts:
+        return None
+    index = parts.index("products")
+    if index + 1 >= len(parts) or not parts[index + 1]:
+        return None
+    handle = parts[index + 1]
+    if handle.endswith(".js") or handle.endswith(".json"):
+        return None
+    return handle
+
+def get_store_root(url):
+    """Return scheme://host for a product URL"""
+    parsed = urllib.parse.urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+def get_shopify_json_url(url):
+    """Map a product page URL to its Shopify /products/<handle>.js endpoint"""
+    handle = get_product_handle(url)
+    if not handle:
+        return None
+    return f"{get_store_root(url)}/products/{handle}.js"
+
+def format_shopify_price(value):
+    """Format a Shopify price (cents int from .js, dollar string from .json)"""
+    if value is None:
+        return "Unknown"
+    if isinstance(value, int):
+        return f"${value / 100:.2f}"
+    try:
+        return f"${float(value):.2f}"
+    except ValueError:
+        return "Unknown"
+
+def parse_shopify_product_json(url, site, data):
+    """Build a snapshot from Shopify product JSON (same flavor rules as the HTML parsers)"""
+    # products/<handle>.json wraps the product, .js does not
+    product = data.get("product", data)
+    name = product.get("title")
+    variants = product.get("variants") or []
+    if not variants:
+        # Not a product document; the HTML page decides instead
+        return None
+
+    in_stock = set()
+    single_variant = len(variants) == 1 and variants[0].get("title") == "Default Title"
+
+    if single_variant:
+        # No variant picker on the page; only some stores (DrSmoke) report these by product name
+        adapter = SITE_ADAPTERS.get(site)
+        if adapter and adapter["single_variant_title"] and name and variants[0].get("available"):
+            in_stock.add(name)
+    else:
+        for variant in variants:
+            if variant.get("available"):
+                value = (variant.get("option1") or variant.get("title") or "").strip()
+                if value and value != "Title":
+                    in_stock.add(value)
+
+    # Price of the variant the page would preselect: first available, else first
+    available = [v for v in variants if v.get("available")]
+    shown = available[0] if available else (variants[0] if variants else {})
+    price = format_shopify_price(shown.get("price", product.get("price")))
+
+    # Only some stores expose inventory counts in their JSON
+    counts = [v["inventory_quantity"] for v in available if isinstance(v.get("inventory_quantity"), int)]
+    inventory_count = sum(c for c in counts if c > 0) if counts else None
+
+    return ProductSnapshot(
+        url=url,
+        site=site,
+        name=name,
+        flavors=frozenset(in_stock),
+        price=price,
+        inventory_count=inventory_count
+    )
+
+async def get_shopify_json_snapshot(url, site):
+    """Try the Shopify JSON endpoint; returns None so callers can fall back to HTML"""
+    if not SHOPIFY_JSON_FIRST:
+        return None
+    json_url = get_shopify_json_url(url)
+    if not json_url:
+        return None
+    try:
+        result = await fetcher.fetch_json_page(json_url, conditional=True)
+        if result is fetcher.NOT_MODIFIED:
+            if json_url in SNAPSHOT_MEMO:
+                return SNAPSHOT_MEMO[json_url]
+            result = await fetcher.fetch_json_page(json_url)
+        page, digest, data = result
+        snapshot = None
+        if isinstance(data, dict):
+            with metrics.timer("parse_seconds", site=site, source="json"):
+                snapshot = parse_shopify_product_json(url, site, data)
+    except Exception as e:
+        if fetcher.is_host_failure(e):
+            # The HTML page is on the same struggling host, don't wait on it too
+            raise
+        snapshot = None
+        print(f"Shopify JSON unavailable for {url}, falling back to HTML: {e}")
+    if snapshot is None:
+        # Not a product document (a captcha, an error page): it must not vouch for the old snapshot
+        SNAPSHOT_MEMO.pop(json_url, None)
+        fetcher.forget(json_url)
+        return None
+    # Only a document that parsed is remembered as the one to compare against
+    fetcher.finish_conditional(page, digest)
+    remember_snapshot(json_url, snapshot)
+    return snapshot
+
+# Decoded /products.json pages from the previous sweep, keyed by page URL
+CATALOG_PAGES = {}
+
+async def fetch_store_catalog(store_root, handles=None):
+    """Page through a store's /products.json and return ({handle: product}, requests made)
+
+    Stops early once every handle in ``handles`` has been seen.
+    """
+    catalog = {}
+    requests = 0
+    wanted = set(handles) if handles else None
+    for page in range(1, BULK_MAX_PAGES + 1):
+        page_url = f"{store_root}/products.json?limit={BULK_PAGE_SIZE}&page={page}"
+        requests += 1
+        result = await fetcher.fetch_json_page(page_url, conditional=True)
+        # Same page as last sweep: reuse the decoded products (and their snapshots)
+        products = CATALOG_PAGES.get(page_url) if result is fetcher.NOT_MODIFIED else None
+        if products is None:
+            if result is fetcher.NOT_MODIFIED:
+                requests += 1
+                result = await fetcher.fetch_json_page(page_url)
+            page_data, digest, data = result
+            if not isinstance(data, dict) or not isinstance(data.get("products"), list):
+                # A captcha or error page: forget it so it is never reused as this page
+                CATALOG_PAGES.pop(page_url, None)
+                fetcher.forget(page_url)
+                raise ValueError(f"{page_url} is not a product catalog")
+            products = data["products"]
+            fetcher.finish_conditional(page_data, digest)
+            CATALOG_PAGES[page_url] = products
+        for product in products:
+            if product.get("handle"):
+                catalog[product["handle"]] = product
+        if len(products) < BULK_PAGE_SIZE:
+            break
+        if wanted is not None and wanted.issubset(catalog):
+            break
+    return catalog, requests
+
+# ==========================
+# SCRAPERS - VAPORHATCH
+# ==========================
+
+# Elements parse_vaporhatch_snapshot reads: (tag, hints found in the opening tag)
+VAPORHATCH_REGIONS = compile_page_regions([
+    ("title", None),
+    ("fieldset", ["product-form__input"]),
+    ("span", ["price-item--regular"]),
+])
+
+def parse_vaporhatch_snapshot(url, html, extracted=False):
+    """Build a snapshot from a VaporHatch product page"""
+    soup = make_product_soup(html, VAPORHATCH_REGIONS, extracted)
+
+    in_stock = set()
+    fieldset = soup.find("fieldset", class_="product-form__input")
+    if fieldset:
+        for inp in fieldset.find_all("input", {"type": "radio"}):
+            if "disabled" not in inp.get("class", []):
+                value = inp.get("value")
+                if value:
+                    in_stock.add(value)
+
+    price = soup.find("span", class_="price-item--regular")
+    if fieldset is None and price is None:
+        # No product form at all (error or bot-check page): stock is unknown, not empty
+        return None
+
+    # VaporHatch: product name comes from the page title, fallback to URL path
+    name = get_page_title(soup) or get_name_from_url_path(url)
+
+    return ProductSnapshot(
+        url=url,
+        site="vaporhatch",
+        name=name,
+        flavors=frozenset(in_stock),
+        price=normalize_price(price.text) if price else "Unknown",
+        inventory_count=None
+    )
+
+async def get_vaporhatch_snapshot(url):
+    return await get_site_snapshot("vaporhatch", url)
+
+async def get_vaporhatch_in_stock_flavors(url):
+    snapshot = await get_vaporhatch_snapshot(url)
+    return set(snapshot.flavors) if snapshot else set()
+
+async def get_vaporhatch_price(url):
+    snapshot = await get_vaporhatch_snapshot(url)
+    return snapshot.price if snapshot else "Unknown"
+
+# ==========================
+# SCRAPERS - DR SMOKE
+# ==========================
+
+# Elements parse_drsmoke_snapshot reads: (tag, hints found in the opening tag)
+DRSMOKE_REGIONS = compile_page_regions([
+    ("title", None),
+    ("h1", ["product-single__title"]),
+    ("select", ["variant"]),
+    ("div", ["ProductInventory"]),
+    ("span", ["product__price", "price-item--regular", "money", "current_price", "itemprop"]),
+])
+
+def parse_drsmoke_snapshot(url, html, extracted=False):
+    """Build a snapshot from a DrSmoke product page"""
+    soup = make_product_soup(html, DRSMOKE_REGIONS, extracted)
+
+    # DrSmoke: get product name from h1 tag (meta title is the fallback)
+    h1 = soup.find('h1', class_='h2 product-single__title')
+    product_name = h1.text.strip() if h1 else None
+
+    inventory_div = soup.find('div', id=lambda x: x and x.startswith('ProductInventory'))
+    inventory_text = inventory_div.text.strip() if inventory_div else ""
+
+    # Find select element with variants
+    select = soup.find('select', class_=lambda x: x and x.startswith('variant__input'))
+    if not select:
+        # Alternative: look for any select with variant in class
+        select = soup.find('select', class_=lambda x: x and 'variant' in x.lower())
+
+    if select is None and inventory_div is None and h1 is None:
+        # No product form at all (error or bot-check page): stock is unknown, not empty
+        return None
+
+    in_stock = set()
+
+    if select:
+        # Get all options that are not disabled
+        for option in select.find_all('option'):
+            if 'disabled' not in option.attrs:
+                value = option.get('value', '').strip()
+                if value and value != "Title":
+                    in_stock.add(value)
+
+    # If no select found, check for single product with inventory
+    if not in_stock and product_name and inventory_div:
+        lowered = inventory_text.lower()
+        if 'in stock' in lowered or 'available' in lowered:
+            in_stock.add(product_name)
+
+    # Try multiple price selectors for DrSmoke
+    price_text = "Unknown"
+    price_selectors = [
+        'span.product__price',
+        'span.price-item--regular',
+        'span.money',
+        'span.current_price',
+        'span[itemprop="price"]'
+    ]
+
+    for selector in price_selectors:
+        price = soup.select_one(selector)
+        if price:
+            price_text = normalize_price(price.text)
+            break
+
+    # Extract number from text like "8 in stock"
+    inventory_count = None
+    match = re.search(r'(\d+)\s*(?:in stock|available|left)', inventory_text, re.IGNORECASE)
+    if match:
+        inventory_count = int(match.group(1))
+
+    return ProductSnapshot(
+        url=url,
+        site="drsmoke",
+        name=product_name or get_page_title(soup),
+        flavors=frozenset(in_stock),
+        price=price_text,
+        inventory_count=inventory_count
+    )
+
+async def get_drsmoke_snapshot(url):
+    return await get_site_snapshot("drsmoke", url)
+
+async def get_drsmoke_in_stock_flavors(url):
+    snapshot = await get_drsmoke_snapshot(url)
+    return set(snapshot.flavors) if snapshot else set()
+
+async def get_drsmoke_price(url):
+    snapshot = await get_drsmoke_snapshot(url)
+    return snapshot.price if snapshot else "Unknown"
+
+async def get_drsmoke_inventory_count(url):
+    """Get inventory count for DrSmoke products"""
+    snapshot = await get_drsmoke_snapshot(url)
+    return snapshot.inventory_count if snapshot else None
+
+# ==========================
+# SITE ADAPTERS
+# ==========================
+
+UNKNOWN_SITE = "unknown"
+
+# site -> {"site", "hosts", "label", "emoji", "parse", "regions", "shopify", "single_variant_title"}
+SITE_ADAPTERS = {}
+
+# Declared host -> site
+SITE_HOSTS = {}
+
+# Any host seen in a product URL -> site (UNKNOWN_SITE when nothing matches)
+ROUTE_CACHE = {}
+ROUTE_CACHE_LIMIT = 5000
+
+def register_site(site, hosts, parse=None, regions=None, label=None, emoji="🛒",
+                  shopify=True, single_variant_title=False, concurrency=None):
+    """Add a store: the hosts it serves, how to fetch it and how to read its pages
+
+    ``shopify`` tries the store's product JSON first and allows bulk catalog
+    polling; ``parse(url, html, extracted=False)`` with its ``regions`` reads the
+    product page (JSON only when there is none), ``extracted`` meaning ``html``
+    is already cut down to those regions. Subdomains of ``hosts`` route here too.
+    """
+    SITE_ADAPTERS[site] = {
+        "site": site,
+        "hosts": [host.lower() for host in hosts],
+        "label": label or site.title(),
+        "emoji": emoji,
+        "parse": parse,
+        "regions": regions,
+        "shopify": shopify,
+        "single_variant_title": single_variant_title,
+    }
+    for host in hosts:
+        SITE_HOSTS[host.lower()] = site
+    if concurrency:
+        SITE_CONCURRENCY.setdefault(site, concurrency)
+    ROUTE_CACHE.clear()
+
+def route_host(host):
+    """Site serving a host, matching it or any parent domain against the declared hosts"""
+    site = ROUTE_CACHE.get(host)
+    if site is None:
+        site = UNKNOWN_SITE
+        parts = host.split(".")
+        for i in range(len(parts) - 1):
+            match = SITE_HOSTS.get(".".join(parts[i:]))
+            if match:
+                site = match
+                break
+        if len(ROUTE_CACHE) >= ROUTE_CACHE_LIMIT:
+            ROUTE_CACHE.clear()
+        ROUTE_CACHE[host] = site
+    return site
+
+def detect_site_from_url(url):
+    """Detect which site the URL belongs to"""
+    return route_host(urllib.parse.urlsplit(url).hostname or "")
+
+def route_product(product):
+    """Resolve a product's site once, when it is added or loaded, so checks never re-detect it"""
+    product["site"] = detect_site_from_url(product["url"])
+    return product["site"]
+
+def supported_hosts():
+    return [adapter["hosts"][0] for adapter in SITE_ADAPTERS.values()]
+
+async def get_site_snapshot(site, url):
+    """Fetch and parse a product through its store's adapter"""
+    adapter = SITE_ADAPTERS.get(site)
+    if adapter is None:
+        print(f"Unknown site for URL: {url}")
+        return None
+    try:
+        if adapter["shopify"]:
+            snapshot = await get_shopify_json_snapshot(url, site)
+            if snapshot:
+                return snapshot
+        if adapter["parse"] is None:
+            return None
+        return await get_html_snapshot(url, site, adapter["parse"], adapter["regions"])
+    except Exception as e:
+        print(f"Error scraping {adapter['label']} {url}: {e}")
+        return None
+
+def register_extra_shopify_sites(spec):
+    """Register stores from EXTRA_SHOPIFY_SITES, read with the VaporHatch page parser as fallback"""
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        site, _, hosts = entry.partition("=")
+        hosts = [host.strip() for host in hosts.split(",") if host.strip()]
+        if not site.strip() or not hosts:
+            print(f"Ignoring malformed EXTRA_SHOPIFY_SITES entry: {entry}")
+            continue
+        register_site(site.strip(), hosts, parse=parse_vaporhatch_snapshot, regions=VAPORHATCH_REGIONS)
+
+register_site(
+    "vaporhatch", ["vaporhatch.com"],
+    parse=parse_vaporhatch_snapshot, regions=VAPORHATCH_REGIONS,
+    label="VaporHatch", emoji="🔥",
+)
+# DrSmoke's product JSON and catalog carry no inventory counts, which its pages show
+register_site(
+    "drsmoke", ["drsmoke.com"],
+    parse=parse_drsmoke_snapshot, regions=DRSMOKE_REGIONS,
+    label="DrSmoke", emoji="🌐", shopify=False, single_variant_title=True,
+)
+register_extra_shopify_sites(EXTRA_SHOPIFY_SITES)
+
+# ==========================
+# UNIVERSAL SCRAPER FUNCTIONS
+# ==========================
+
+async def get_product_snapshot(url, site=None):
+    """Universal function to fetch and parse a product page once"""
+    return await get_site_snapshot(site or detect_site_from_url(url), url)
+
+async def get_in_stock_flavors(url):
+    """Universal function to get in-stock flavors based on site"""
+    snapshot = await get_product_snapshot(url)
+    return set(snapshot.flavors) if snapshot else set()
+
+async def get_price(url):
+    """Universal function to get price based on site"""
+    snapshot = await get_product_snapshot(url)
+    return snapshot.price if snapshot else "Unknown"
+
+async def get_inventory_info(url):
+    """Get additional inventory information if available"""
+    snapshot = await get_product_snapshot(url)
+    return format_inventory_info(snapshot.inventory_count) if snapshot else ""
+
+async def get_stock_for_url(url):
+    """Get stock and price for any given URL (``unknown`` is set when the page couldn't be read)"""
+    snapshot = await get_cached_snapshot(url)
+    unknown = snapshot is None
+    if unknown:
+        snapshot = ProductSnapshot(url, detect_site_from_url(url), None, frozenset(), "Unknown", None)
+
+    return {
+        "name": snapshot.name or get_name_from_url_path(url, min_parts=2) or "Custom Product",
+        "flavors": set(snapshot.flavors),
+        "price": snapshot.price,
+        "url": url,
+        "inventory_info": format_inventory_info(snapshot.inventory_count),
+        "site": snapshot.site,
+        "unknown": unknown
+    }
+
+# ==========================
+# SNAPSHOT CACHE
+# ==========================
+
+# canonical url -> (expires_at, snapshot)
+SNAPSHOT_CACHE = {}
+SNAPSHOT_CACHE_LIMIT = 5000
+
+# canonical url -> task already fetching it, shared by every concurrent caller
+IN_FLIGHT = {}
+
+CACHE_STATS = {"hits": 0, "misses": 0, "coalesced": 0}
+
+# Query parameters that pick a preselected variant or track the visit, never the page content
+IGNORED_QUERY_PARAMS = {
+    "variant", "ref", "ref_", "fbclid", "gclid", "dclid", "msclkid", "srsltid",
+    "mc_cid", "mc_eid", "_pos", "_sid", "_ss", "_psq", "_fid", "_v",
+}
+
+def canonical_url(url):
+    """Normalize a product URL so every way of writing the same page maps to one key
+
+    Lowercases the host and drops www., the default port and the fragment,
+    treats http like https, maps /collections/<name>/products/<handle> to
+    /products/<handle>, strips the trailing slash and removes variant and
+    tracking parameters (any other parameters are kept, sorted). Returns
+    None for a URL with a malformed or out of range port.
+    """
+    parsed = urllib.parse.urlparse(url.strip())
+    try:
+        port = parsed.port
+    except ValueError:
+        return None
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    path = parsed.path.rstrip('/') or '/'
+    handle = get_product_handle(url)
+    if handle:
+        path = f"/products/{handle}"
+
+    query = sorted(
+        (name, value)
+        for name, value in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        if name.lower() not in IGNORED_QUERY_PARAMS and not name.lower().startswith("utm_")
+    )
+    canonical = f"https://{host}{path}"
+    if query:
+        canonical += "?" + urllib.parse.urlencode(query)
+    return canonical
+
+def cache_snapshot(url, snapshot):
+    """Store a fresh snapshot for SNAPSHOT_TTL seconds"""
+    now = time.monotonic()
+    if len(SNAPSHOT_CACHE) >= SNAPSHOT_CACHE_LIMIT:
+        # Drop expired entries first, then the oldest if still full
+        for key in [k for k, (expires, _) in SNAPSHOT_CACHE.items() if expires <= now]:
+            del SNAPSHOT_CACHE[key]
+        if len(SNAPSHOT_CACHE) >= SNAPSHOT_CACHE_LIMIT:
+            SNAPSHOT_CACHE.pop(next(iter(SNAPSHOT_CACHE)))
+    key = canonical_url(url)
+    if key is not None:
+        SNAPSHOT_CACHE[key] = (now + SNAPSHOT_TTL, snapshot)
+
+async def get_cached_snapshot(url, site=None):
+    """Return a recent snapshot for the URL, sharing one fetch between concurrent callers
+
+    Pass the product's ``site`` when it is known to skip detecting it from the URL.
+    """
+    key = canonical_url(url)
+    if key is None:
+        # Not a fetchable URL; nothing to share with other callers
+        return await get_product_snapshot(url, site)
+
+    entry = SNAPSHOT_CACHE.get(key)
+    if entry and entry[0] > time.monotonic():
+        CACHE_STATS["hits"] += 1
+        return entry[1]
+
+    task = IN_FLIGHT.get(key)
+    if task is not None:
+        CACHE_STATS["coalesced"] += 1
+    else:
+        CACHE_STATS["misses"] += 1
+        task = asyncio.ensure_future(get_product_snapshot(url, site))
+        IN_FLIGHT[key] = task
+
+        def finished(t):
+            IN_FLIGHT.pop(key, None)
+            # Failures are not cached so the next caller retries
+            if not t.cancelled() and t.exception() is None and t.result() is not None:
+                cache_snapshot(url, t.result())
+
+        task.add_done_callback(finished)
+
+    # Shield so one impatient caller can't cancel the fetch for everyone else
+    return await asyncio.shield(task)
+
+def get_cache_stats():
+    """Snapshot cache counters plus the current hit ratio"""
+    lookups = CACHE_STATS["hits"] + CACHE_STATS["misses"] + CACHE_STATS["coalesced"]
+    stats = dict(CACHE_STATS)
+    stats["entries"] = len(SNAPSHOT_CACHE)
+    stats["hit_ratio"] = (CACHE_STATS["hits"] + CACHE_STATS["coalesced"]) / lookups if lookups else 0.0
+    return stats
+
+# ==========================
+# BACKGROUND STOCK CHECK
+# ==========================
+
+# Limits are created on first use so they bind to the bot's event loop
+SWEEP_SEMAPHORE = None
+SITE_SEMAPHORES = {}
+
+# Timing of the most recent sweeps, used to judge headroom against the loop interval
+SWEEP_STATS = {
+    "count": 0,
+    "last_duration": None,
+    "max_duration": None,
+    "last_products": 0,
+}
+
+# product_id -> snapshot the last diff ran against
+LAST_SNAPSHOTS = {}
+
+# product_id -> (catalog entry, snapshot) so unchanged catalog pages skip the parse
+CATALOG_SNAPSHOTS = {}
+
+def get_site_semaphore(site):
+    """Return the concurrency limiter for a site, creating it if needed"""
+    if site not in SITE_SEMAPHORES:
+        SITE_SEMAPHORES[site] = asyncio.Semaphore(SITE_CONCURRENCY.get(site, DEFAULT_SITE_CONCURRENCY))
+    return SITE_SEMAPHORES[site]
+
+def get_sweep_semaphore():
+    """Return the global sweep concurrency limiter, creating it if needed"""
+    global SWEEP_SEMAPHORE
+    if SWEEP_SEMAPHORE is None:
+        SWEEP_SEMAPHORE = asyncio.Semaphore(SWEEP_CONCURRENCY)
+    return SWEEP_SEMAPHORE
+
+async def fetch_snapshot_limited(product):
+    """Fetch a product snapshot while respecting the per-site and global caps"""
+    site = product["site"]
+    # Take the site slot first so a busy site can't hog global slots
+    async with get_site_semaphore(site):
+        async with get_sweep_semaphore():
+            return await get_cached_snapshot(product["url"], site)
+
+async def check_product(product_id, product):
+    """Fetch one product page and queue alerts; returns whether its stock changed"""
+    try:
+        snapshot = await fetch_snapshot_limited(product)
+    except Exception as e:
+        print(f"Error checking {product['name']}: {e}")
+        return False
+    return await apply_snapshot(product_id, product, snapshot)
+
+# Callables receiving every stock change as a JSON-friendly dict (alerts, CLI output)
+DIFF_LISTENERS = []
+
+def add_diff_listener(listener):
+    DIFF_LISTENERS.append(listener)
+
+def emit_diff(diff):
+    for listener in DIFF_LISTENERS:
+        try:
+            listener(diff)
+        except Exception as e:
+            print(f"Diff listener failed for {diff['product']}: {e}")
+
+async def apply_snapshot(product_id, product, snapshot):
+    """Diff a fresh snapshot against the stored stock and report changes to the diff listeners
+
+    Returns True when something restocked or sold out.
+    """
+    start = time.perf_counter()
+    try:
+        # Failed fetch: stock is unknown, not empty, so there is nothing to diff
+        if snapshot is None:
+            return False
+
+        # Unchanged pages hand back the very same snapshot object: nothing to diff
+        if product["initialized"] and LAST_SNAPSHOTS.get(product_id) is snapshot:
+            record_state(product_id, product)
+            return False
+        LAST_SNAPSHOTS[product_id] = snapshot
+
+        current_stock = set(snapshot.flavors)
+        previous_stock = product["last_stock"]
+
+        # First run = initialize only
+        if not product["initialized"]:
+            product["last_stock"] = current_stock
+            product["last_price"] = snapshot.price
+            product["initialized"] = True
+            search.add_flavors(product_id, current_stock)
+            record_state(product_id, product)
+            return False
+
+        restocked = current_stock - previous_stock
+        sold_out = previous_stock - current_stock
+        price = snapshot.price
+        inventory_info = format_inventory_info(snapshot.inventory_count)
+
+        known_price = price if price != "Unknown" else None
+        history.record_transitions(product_id, restocked, sold_out, product.get("last_price"), known_price)
+
+        if restocked:
+            search.add_flavors(product_id, restocked)
+
+        if restocked or sold_out:
+            emit_diff({
+                "ts": time.time(),
+                "product": product_id,
+                "name": product["name"],
+                "url": product["url"],
+                "site": snapshot.site,
+                "restocked": sorted(restocked),
+                "sold_out": sorted(sold_out),
+                "price": price,
+                "old_price": product.get("last_price"),
+                "inventory": snapshot.inventory_count,
+                "inventory_info": inventory_info,
+            })
+
+        product["last_stock"] = current_stock
+        product["last_price"] = known_price or product.get("last_price")
+        record_state(product_id, product)
+        return bool(restocked or sold_out)
+        
+    except Exception as e:
+        print(f"Error checking {product['name']}: {e}")
+        return False
+    finally:
+        if snapshot is not None:
+            metrics.observe("diff_seconds", time.perf_counter() - start, site=snapshot.site)
+
+# product_id -> state row waiting to be written at the end of the tick
+PENDING_STATES = {}
+
+def record_state(product_id, product):
+    """Queue a product's current stock, price and check time for the state store"""
+    PENDING_STATES[product_id] = (
+        product_id,
+        set(product["last_stock"]),
+        product.get("last_price"),
+        product["initialized"],
+        time.time(),
+    )
+
+def flush_states():
+    """Write every queued state row in a single transaction (dropped when PERSIST_STATE is off)"""
+    if not PENDING_STATES and not history.PENDING_EVENTS:
+        return
+    if not PERSIST_STATE:
+        PENDING_STATES.clear()
+        history.PENDING_EVENTS.clear()
+        return
+    rows = [row for product_id, row in PENDING_STATES.items() if product_id in PRODUCTS]
+    try:
+        store.save_states(rows)
+    except Exception as e:
+        # Rows stay queued and go out with the next tick
+        print(f"Error saving stock state: {e}")
+    else:
+        PENDING_STATES.clear()
+
+    try:
+        history.flush()
+    except Exception as e:
+        print(f"Error saving stock history: {e}")
+
+async def check_page(entries):
+    """Fetch a page once and diff it for every product watching it
+
+    Returns {product_id: changed} for every entry.
+    """
+    try:
+        snapshot = await fetch_snapshot_limited(entries[0][1])
+    except Exception as e:
+        print(f"Error checking {entries[0][1]['name']}: {e}")
+        return {product_id: False for product_id, _ in entries}
+    return {
+        product_id: await apply_snapshot(product_id, product, snapshot)
+        for product_id, product in entries
+    }
+
+def group_products_by_page(products):
+    """Group (product_id, product) pairs by canonical page URL"""
+    pages = {}
+    for product_id, product in products:
+        pages.setdefault(canonical_url(product["url"]) or product["url"], []).append((product_id, product))
+    return pages
+
+def group_products_by_store(products):
+    """Split (product_id, product) pairs into bulk-pollable stores and the rest"""
+    stores = {}
+    single = []
+    for product_id, product in products:
+        adapter = SITE_ADAPTERS.get(product["site"])
+        if adapter and adapter["shopify"] and get_product_handle(product["url"]):
+            stores.setdefault(get_store_root(product["url"]), []).append((product_id, product))
+        else:
+            single.append((product_id, product))
+
+    bulk = {}
+    for store_root, entries in stores.items():
+        if BULK_POLLING and SHOPIFY_JSON_FIRST and len(entries) >= BULK_MIN_PRODUCTS:
+            bulk[store_root] = entries
+        else:
+            single.extend(entries)
+    return bulk, single
+
+async def check_store(store_root, entries, reserved=None):
+    """Check every watched product of one store from its paginated catalog
+
+    ``reserved`` is what the scheduler took from the request budget for this
+    poll; the difference to the requests actually made is settled afterwards.
+    Returns {product_id: changed} for every entry.
+    """
+    site = entries[0][1]["site"]
+    handles = {get_product_handle(product["url"]) for _, product in entries}
+    requests = 0
+    try:
+        async with get_site_semaphore(site):
+            async with get_sweep_semaphore():
+                catalog, requests = await fetch_store_catalog(store_root, handles)
+    except Exception as e:
+        if fetcher.is_host_failure(e):
+            # Stock is unknown for the whole store; per-product fetches would fail the same way
+            print(f"Bulk poll failed for {store_root}, skipping this check: {e}")
+            return {product_id: False for product_id, _ in entries}
+        print(f"Bulk poll failed for {store_root}, checking products one by one: {e}")
+        catalog = {}
+
+    results = {}
+    fallback_ids = []
+    fallback = []
+    for product_id, product in entries:
+        data = catalog.get(get_product_handle(product["url"]))
+        snapshot = None
+        if data is not None:
+            previous = CATALOG_SNAPSHOTS.get(product_id)
+            if previous and previous[0] is data:
+                # Catalog page came back unchanged, keep the same snapshot object
+                snapshot = previous[1]
+            else:
+                with metrics.timer("parse_seconds", site=site, source="catalog"):
+                    snapshot = parse_shopify_product_json(product["url"], site, data)
+                CATALOG_SNAPSHOTS[product_id] = (data, snapshot)
+        if snapshot is None:
+            # Unlisted, hidden from the catalog or listed without variants: fetch it on its own
+            fallback_ids.append(product_id)
+            fallback.append(check_product(product_id, product))
+            continue
+        # Let /stock reuse what the sweep just saw
+        cache_snapshot(product["url"], snapshot)
+        results[product_id] = await apply_snapshot(product_id, product, snapshot)
+
+    results.update(zip(fallback_ids, await asyncio.gather(*fallback)))
+
+    # Every catalog page plus one page fetch per fallback, like the scheduler counts single pages
+    requests += len(fallback)
+    STORE_POLL_COSTS[store_root] = requests
+    if reserved is not None:
+        settle_request_budget(reserved, requests)
+    return results
+
+def record_sweep(duration, product_count):
+    """Store sweep timing and log how much of the scheduler tick it used"""
+    SWEEP_STATS["count"] += 1
+    SWEEP_STATS["last_duration"] = duration
+    SWEEP_STATS["last_products"] = product_count
+    if SWEEP_STATS["max_duration"] is None or duration > SWEEP_STATS["max_duration"]:
+        SWEEP_STATS["max_duration"] = duration
+    metrics.observe("sweep_seconds", duration)
+    metrics.inc("sweep_products_total", product_count)
+
+    cache = get_cache_stats()
+    alerts = dispatch.get_dispatch_stats()
+    open_hosts = [host for host, health in fetcher.get_host_health().items() if health["open"]]
+    latency = f"{alerts['last_latency']:.1f}s" if alerts["last_latency"] is not None else "n/a"
+    print(
+        f"Checked {product_count} due products in {duration:.1f}s "
+        f"({duration / SCHEDULER_TICK_SECONDS:.0%} of the {SCHEDULER_TICK_SECONDS}s tick), "
+        f"{len(NEXT_CHECK)} scheduled, {REQUEST_BUDGET['tokens']:.0f} requests of budget left, "
+        f"cache hits {cache['hits']} / coalesced {cache['coalesced']} / misses {cache['misses']}, "
+        f"{alerts['queue_depth']} alerts queued (last send latency {latency}, {alerts['failed']} failed)"
+        + (f", circuit open for {', '.join(open_hosts)}" if open_hosts else "")
+    )
+
+def collect_gauges():
+    """Point-in-time values for the metrics endpoint"""
+    cache = get_cache_stats()
+    gauges = [
+        ("cache_lookups", {"result": "hit"}, cache["hits"]),
+        ("cache_lookups", {"result": "coalesced"}, cache["coalesced"]),
+        ("cache_lookups", {"result": "miss"}, cache["misses"]),
+        ("cache_entries", {}, cache["entries"]),
+        ("alert_queue_depth", {}, dispatch.queue_depth()),
+        ("watched_products", {}, len(PRODUCTS)),
+        ("request_budget_tokens", {}, REQUEST_BUDGET["tokens"]),
+        ("parse_pool_in_flight", {}, PARSE_STATS["in_flight"]),
+        ("parse_pool_waiting", {}, PARSE_STATS["waiting"]),
+        ("parse_pool_pages", {"where": "pool"}, PARSE_STATS["offloaded"]),
+        ("parse_pool_pages", {"where": "inline"}, PARSE_STATS["inline"]),
+        ("parse_pool_saturated", {}, PARSE_STATS["waited"]),
+    ]
+    for host, health in fetcher.get_host_health().items():
+        gauges.append(("host_circuit_open", {"host": host}, int(health["open"])))
+        gauges.append(("host_timeout_seconds", {"host": host}, health["timeout"]))
+    return gauges
+
+metrics.register_collector(collect_gauges)
+
+# ==========================
+# ADAPTIVE SCHEDULER
+# ==========================
+
+# Min-heap of (due_at, product_id); stale entries are skipped using NEXT_CHECK
+SCHEDULE = []
+
+# product_id -> due_at of its live heap entry
+NEXT_CHECK = {}
+
+# product_id -> current check interval in seconds
+CHECK_INTERVALS = {}
+
+# Token bucket refilled at REQUEST_BUDGET_PER_MINUTE; goes negative when a poll took
+# more requests than were reserved for it, which holds back later checks until it refills
+REQUEST_BUDGET = {"tokens": float(REQUEST_BUDGET_PER_MINUTE), "updated": None}
+
+# store root -> requests its last bulk poll made (catalog pages plus per-product fallbacks)
+STORE_POLL_COSTS = {}
+
+def schedule_product(product_id, delay):
+    """Queue a product's next check ``delay`` seconds from now"""
+    due_at = time.monotonic() + delay
+    NEXT_CHECK[product_id] = due_at
+    heapq.heappush(SCHEDULE, (due_at, product_id))
+
+def sync_schedule():
+    """Schedule newly added products right away and forget removed ones"""
+    for product_id in PRODUCTS:
+        if product_id not in NEXT_CHECK:
+            CHECK_INTERVALS.setdefault(product_id, STOCK_CHECK_MINUTES * 60)
+            schedule_product(product_id, 0)
+    for product_id in [p for p in NEXT_CHECK if p not in PRODUCTS]:
+        del NEXT_CHECK[product_id]
+        CHECK_INTERVALS.pop(product_id, None)
+
+def pop_due_products():
+    """Remove and return the ids of every product whose check is due"""
+    now = time.monotonic()
+    due = []
+    while SCHEDULE and SCHEDULE[0][0] <= now:
+        due_at, product_id = heapq.heappop(SCHEDULE)
+        # Skip entries superseded by a later schedule_product call
+        if NEXT_CHECK.get(product_id) == due_at and product_id in PRODUCTS:
+            del NEXT_CHECK[product_id]
+            due.append(product_id)
+    return due
+
+def reschedule_after_check(product_id, changed):
+    """Shrink the interval after a transition, back off exponentially when quiet"""
+    if product_id not in PRODUCTS:
+        return
+    if changed:
+        interval = MIN_CHECK_SECONDS
+    else:
+        interval = CHECK_INTERVALS.get(product_id, STOCK_CHECK_MINUTES * 60) * CHECK_BACKOFF
+    interval = max(MIN_CHECK_SECONDS, min(MAX_CHECK_SECONDS, interval))
+    CHECK_INTERVALS[product_id] = interval
+    schedule_product(product_id, interval * random.uniform(1 - CHECK_JITTER, 1 + CHECK_JITTER))
+
+def refill_request_budget():
+    now = time.monotonic()
+    if REQUEST_BUDGET["updated"] is not None:
+        refill = (now - REQUEST_BUDGET["updated"]) * REQUEST_BUDGET_PER_MINUTE / 60
+        REQUEST_BUDGET["tokens"] = min(float(REQUEST_BUDGET_PER_MINUTE), REQUEST_BUDGET["tokens"] + refill)
+    REQUEST_BUDGET["updated"] = now
+
+def take_request_budget(cost):
+    """Spend ``cost`` requests from the per-minute budget if there is enough left"""
+    refill_request_budget()
+    if REQUEST_BUDGET["tokens"] < cost:
+        return False
+    REQUEST_BUDGET["tokens"] -= cost
+    return True
+
+def settle_request_budget(reserved, used):
+    """Charge (or refund) the difference between a reservation and the requests made"""
+    refill_request_budget()
+    REQUEST_BUDGET["tokens"] = min(float(REQUEST_BUDGET_PER_MINUTE), REQUEST_BUDGET["tokens"] - (used - reserved))
+
+def defer_due(deferred, entries, due, delay):
+    """Postpone the due products among ``entries`` by at least one tick"""
+    for product_id, _ in entries:
+        if product_id in due:
+            deferred[product_id] = max(delay, SCHEDULER_TICK_SECONDS)
+
+def plan_due_checks(due_ids, use_budget=True):
+    """Group due products into bulk store polls and page fetches within the budget
+
+    A store poll covers every watched product of that store, and a page fetch
+    every product watching that page, so products that weren't due yet ride
+    along for free. Whatever doesn't fit is deferred: returns
+    ({store_root: (entries, reserved budget)}, pages, {product_id: delay}).
+    A store poll reserves what its last poll really cost; check_store settles
+    the difference once it is done. Products on a host whose circuit is
+    open wait until it may be tried again, without spending budget.
+    ``use_budget=False`` ignores the request budget (one-off sweeps).
+    """
+    due = set(due_ids)
+    bulk, single = group_products_by_store(list(PRODUCTS.items()))
+
+    stores = {}
+    pages = {}
+    deferred = {}
+    for store_root, entries in bulk.items():
+        if not any(product_id in due for product_id, _ in entries):
+            continue
+        if not fetcher.host_available(store_root):
+            defer_due(deferred, entries, due, fetcher.retry_after(store_root))
+            continue
+        # What the last poll of this store really took, catalog pages and fallbacks included
+        # (never more than a full bucket, or a big store could never be polled again)
+        cost = max(1 + len(entries) // BULK_PAGE_SIZE, STORE_POLL_COSTS.get(store_root, 0))
+        cost = min(cost, REQUEST_BUDGET_PER_MINUTE)
+        if not use_budget:
+            stores[store_root] = (entries, None)
+        elif take_request_budget(cost):
+            stores[store_root] = (entries, cost)
+        else:
+            defer_due(deferred, entries, due, SCHEDULER_TICK_SECONDS)
+
+    for page_url, entries in group_products_by_page(single).items():
+        if not any(product_id in due for product_id, _ in entries):
+            continue
+        fetch_url = entries[0][1]["url"]
+        if not fetcher.host_available(fetch_url):
+            defer_due(deferred, entries, due, fetcher.retry_after(fetch_url))
+            continue
+        if not use_budget or take_request_budget(1):
+            pages[page_url] = entries
+        else:
+            defer_due(deferred, entries, due, SCHEDULER_TICK_SECONDS)
+
+    return stores, pages, deferred
+
+async def run_sweep(product_ids=None, use_budget=True):
+    """Check every due product (or exactly ``product_ids``) once; returns {product_id: changed}"""
+    sync_schedule()
+    due_ids = pop_due_products() if product_ids is None else [p for p in product_ids if p in PRODUCTS]
+    if not due_ids:
+        return {}
+
+    start = time.monotonic()
+    stores, pages, deferred = plan_due_checks(due_ids, use_budget)
+
+    # Over budget or host circuit open: try again later
+    for product_id, delay in deferred.items():
+        schedule_product(product_id, delay)
+
+    outcomes = await asyncio.gather(
+        *(check_store(store_root, entries, reserved) for store_root, (entries, reserved) in stores.items()),
+        *(check_page(entries) for entries in pages.values())
+    )
+
+    results = {}
+    for result in outcomes:
+        results.update(result)
+
+    for product_id, changed in results.items():
+        reschedule_after_check(product_id, changed)
+    flush_states()
+
+    record_sweep(time.monotonic() - start, len(results))
+    return results
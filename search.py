@@ -0,0 +1,190 @@
+import re
+import heapq
+import bisect
+
+# ==========================
+# PRODUCT SEARCH INDEX
+# ==========================
+
+# product key -> {"name", "sort_name", "name_tokens", "flavor_tokens", "trigrams"}
+ENTRIES = {}
+
+# token -> {product key}, split so name matches can rank above flavor-only matches
+NAME_POSTINGS = {}
+FLAVOR_POSTINGS = {}
+
+# Sorted distinct tokens of each postings dict: a prefix is one bisect plus a short scan
+NAME_VOCAB = []
+FLAVOR_VOCAB = []
+
+# trigram -> {product key}, used when no token starts with what was typed (typos)
+TRIGRAMS = {}
+
+# Sorted [(lowercased name, product key)] for ordering and the empty-query listing
+BY_NAME = []
+
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def trigrams(text):
+    padded = f"  {' '.join(tokenize(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def add_posting(postings, vocab, token, key):
+    if token not in postings:
+        postings[token] = set()
+        bisect.insort(vocab, token)
+    postings[token].add(key)
+
+def discard_posting(postings, vocab, token, key):
+    keys = postings.get(token)
+    if keys is None:
+        return
+    keys.discard(key)
+    if not keys:
+        del postings[token]
+        del vocab[bisect.bisect_left(vocab, token)]
+
+def index_product(key, name, flavors=()):
+    """Add a product (or refresh its name) in the index"""
+    remove_product(key)
+    entry = {
+        "name": name,
+        "sort_name": name.lower(),
+        "name_tokens": set(tokenize(name)) | set(tokenize(key)),
+        "flavor_tokens": set(),
+        "trigrams": trigrams(f"{name} {key}"),
+    }
+    ENTRIES[key] = entry
+    bisect.insort(BY_NAME, (entry["sort_name"], key))
+    for token in entry["name_tokens"]:
+        add_posting(NAME_POSTINGS, NAME_VOCAB, token, key)
+    for gram in entry["trigrams"]:
+        TRIGRAMS.setdefault(gram, set()).add(key)
+    add_flavors(key, flavors)
+
+def add_flavors(key, flavors):
+    """Make a product findable by flavors it has been seen with"""
+    entry = ENTRIES.get(key)
+    if entry is None:
+        return
+    for flavor in flavors:
+        for token in tokenize(flavor):
+            if token not in entry["flavor_tokens"]:
+                entry["flavor_tokens"].add(token)
+                add_posting(FLAVOR_POSTINGS, FLAVOR_VOCAB, token, key)
+
+def remove_product(key):
+    entry = ENTRIES.pop(key, None)
+    if entry is None:
+        return
+    del BY_NAME[bisect.bisect_left(BY_NAME, (entry["sort_name"], key))]
+    for token in entry["name_tokens"]:
+        discard_posting(NAME_POSTINGS, NAME_VOCAB, token, key)
+    for token in entry["flavor_tokens"]:
+        discard_posting(FLAVOR_POSTINGS, FLAVOR_VOCAB, token, key)
+    for gram in entry["trigrams"]:
+        keys = TRIGRAMS.get(gram)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del TRIGRAMS[gram]
+
+def prefix_matches(postings, vocab, prefix):
+    """Product keys having a token that starts with ``prefix``"""
+    keys = set()
+    index = bisect.bisect_left(vocab, prefix)
+    while index < len(vocab) and vocab[index].startswith(prefix):
+        keys |= postings[vocab[index]]
+        index += 1
+    return keys
+
+def match_all(words, postings_vocabs):
+    """Keys where every word prefix-matches a token from one of the given indexes"""
+    candidates = None
+    for word in words:
+        matches = set()
+        for postings, vocab in postings_vocabs:
+            matches |= prefix_matches(postings, vocab, word)
+        candidates = matches if candidates is None else candidates & matches
+        if not candidates:
+            return set()
+    return candidates
+
+def first_by_name(keys, limit):
+    """The ``limit`` alphabetically first of ``keys``"""
+    if limit <= 0 or not keys:
+        return []
+    if len(keys) * 4 >= len(BY_NAME):
+        # Dense: walking the sorted names finds enough members almost immediately
+        found = []
+        for _, key in BY_NAME:
+            if key in keys:
+                found.append(key)
+                if len(found) == limit:
+                    break
+        return found
+    return heapq.nsmallest(limit, keys, key=lambda key: ENTRIES[key]["sort_name"])
+
+def count_shared_trigrams(grams, common=None):
+    """{key: trigrams shared with ``grams``}, skipping trigrams more than ``common`` products have"""
+    counts = {}
+    for gram in grams:
+        keys = TRIGRAMS.get(gram, ())
+        if common is not None and len(keys) > common:
+            continue
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def most_shared(counts, limit):
+    # Require a few shared trigrams so single letters don't match everything
+    return heapq.nsmallest(
+        limit,
+        (key for key, count in counts.items() if count >= 3),
+        key=lambda key: (-counts[key], ENTRIES[key]["sort_name"])
+    )
+
+def fuzzy_matches(query, limit):
+    """Keys sharing the most name trigrams with the query"""
+    grams = trigrams(query)
+    # Trigrams most products share say little and cost the most to count
+    results = most_shared(count_shared_trigrams(grams, max(50, len(ENTRIES) // 10)), limit)
+    if not results:
+        # The typo only left common trigrams ("gek bar" among thousands of Geek Bars):
+        # count those too rather than find nothing
+        results = most_shared(count_shared_trigrams(grams), limit)
+    return results
+
+def search(query, limit=25):
+    """Best matching product keys for what the user has typed so far
+
+    Order: exact key, names starting with the query, names matching every
+    word, products matching only through flavors, then typo matches.
+    """
+    words = tokenize(query)
+    if not words:
+        return [key for _, key in BY_NAME[:limit]]
+
+    lowered = query.strip().lower()
+    results = [lowered] if lowered in ENTRIES else []
+
+    index = bisect.bisect_left(BY_NAME, (lowered,))
+    while index < len(BY_NAME) and len(results) < limit and BY_NAME[index][0].startswith(lowered):
+        if BY_NAME[index][1] not in results:
+            results.append(BY_NAME[index][1])
+        index += 1
+
+    if len(results) < limit:
+        name_hits = match_all(words, [(NAME_POSTINGS, NAME_VOCAB)]).difference(results)
+        results += first_by_name(name_hits, limit - len(results))
+
+    if len(results) < limit:
+        flavor_hits = match_all(
+            words, [(NAME_POSTINGS, NAME_VOCAB), (FLAVOR_POSTINGS, FLAVOR_VOCAB)]
+        ).difference(results)
+        results += first_by_name(flavor_hits, limit - len(results))
+
+    if not results:
+        results = fuzzy_matches(query, limit)
+    return results
@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import bisect
+import asyncio
+import hashlib
+
+# ==========================
+# CONFIG
+# ==========================
+
+# Scraper worker processes; 0 keeps every check inside the bot process
+SCRAPER_WORKERS = int(os.environ.get("SCRAPER_WORKERS", "0"))
+
+# Points per worker on the hash ring; more points spread products more evenly
+VIRTUAL_NODES = 64
+
+# A crashed worker is restarted after this, doubling while it keeps crashing
+RESTART_BASE_SECONDS = 2.0
+RESTART_MAX_SECONDS = 60.0
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+
+# ==========================
+# CONSISTENT HASHING
+# ==========================
+
+# shard count -> (sorted point hashes, shard of each point)
+RINGS = {}
+
+def ring_hash(value):
+    return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+def get_ring(shards):
+    ring = RINGS.get(shards)
+    if ring is None:
+        points = sorted(
+            (ring_hash(f"shard-{shard}-{replica}"), shard)
+            for shard in range(shards)
+            for replica in range(VIRTUAL_NODES)
+        )
+        ring = ([point for point, _ in points], [shard for _, shard in points])
+        RINGS[shards] = ring
+    return ring
+
+def shard_for(product_key, shards):
+    """Worker that owns a product; only ~1/N of products move when N changes"""
+    if shards <= 1:
+        return 0
+    points, owners = get_ring(shards)
+    index = bisect.bisect(points, ring_hash(product_key)) % len(points)
+    return owners[index]
+
+# ==========================
+# WORKER SUPERVISOR
+# ==========================
+
+# shard -> {"process", "started", "restarts", "records", "last_record"}
+WORKERS = {}
+_tasks = {}
+_handler = None
+_stopping = False
+
+def worker_command(shard, shards):
+    return [sys.executable, CLI_PATH, "--worker", "--shard", str(shard), "--shards", str(shards)]
+
+async def supervise(shard, shards):
+    """Run one worker, feed its output to the handler and restart it when it dies"""
+    delay = RESTART_BASE_SECONDS
+    state = WORKERS.setdefault(shard, {"process": None, "started": None, "restarts": 0, "records": 0, "last_record": None})
+    while not _stopping:
+        started = time.monotonic()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *worker_command(shard, shards),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                # Diff lines can carry hundreds of flavors
+                limit=2 ** 20,
+            )
+        except Exception as e:
+            print(f"Couldn't start scraper worker {shard}: {e}")
+        else:
+            state["process"] = process
+            state["started"] = time.time()
+            print(f"Scraper worker {shard}/{shards} started (pid {process.pid})")
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"Worker {shard} sent a bad line: {line[:200]!r}")
+                    continue
+                state["records"] += 1
+                state["last_record"] = time.time()
+                try:
+                    _handler(record)
+                except Exception as e:
+                    print(f"Error handling worker {shard} record: {e}")
+            code = await process.wait()
+            state["process"] = None
+            if _stopping:
+                break
+            print(f"Scraper worker {shard} exited with {code}")
+
+        # Reset the backoff once a worker has stayed up for a while
+        if time.monotonic() - started > RESTART_MAX_SECONDS:
+            delay = RESTART_BASE_SECONDS
+        state["restarts"] += 1
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, RESTART_MAX_SECONDS)
+
+def start_workers(handler, count=None):
+    """Start ``count`` scraper workers (once) and pass every record they print to ``handler``"""
+    global _handler
+    count = SCRAPER_WORKERS if count is None else count
+    _handler = handler
+    for shard in range(count):
+        if shard not in _tasks or _tasks[shard].done():
+            _tasks[shard] = asyncio.ensure_future(supervise(shard, count))
+
+def running():
+    return bool(_tasks)
+
+def send_command(shard, command):
+    """Write one JSON command to a worker; a worker that is restarting reloads from the store anyway"""
+    process = WORKERS.get(shard, {}).get("process")
+    if process is None or process.stdin is None or process.stdin.is_closing():
+        return False
+    process.stdin.write((json.dumps(command) + "\n").encode())
+    return True
+
+def product_added(product_key, product):
+    """Hand a newly watched product to the worker that owns it"""
+    if not _tasks:
+        return
+    send_command(shard_for(product_key, len(_tasks)), {
+        "op": "add",
+        "product": product_key,
+        "data": {"name": product["name"], "url": product["url"], "is_custom": product.get("is_custom", False)},
+    })
+
+def product_removed(product_key):
+    if not _tasks:
+        return
+    send_command(shard_for(product_key, len(_tasks)), {"op": "remove", "product": product_key})
+
+async def stop_workers():
+    """Stop every worker by closing its stdin (workers exit when the bot goes away)"""
+    global _stopping
+    _stopping = True
+    for state in WORKERS.values():
+        process = state["process"]
+        if process is not None and process.stdin is not None:
+            process.stdin.close()
+    for task in _tasks.values():
+        try:
+            await asyncio.wait_for(task, 10)
+        except asyncio.TimeoutError:
+            task.cancel()
+    _tasks.clear()
+
+def get_worker_stats():
+    """{shard: summary} for /stats"""
+    return {
+        shard: {
+            "pid": state["process"].pid if state["process"] else None,
+            "restarts": state["restarts"],
+            "records": state["records"],
+            "last_record": state["last_record"],
+        }
+        for shard, state in sorted(WORKERS.items())
+    }
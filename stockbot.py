@@ -0,0 +1,767 @@
+import os
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+import time
+import asyncio
+import fetcher
+import store
+import history
+import dispatch
+import subscriptions
+import search
+import metrics
+import scraper
+import shards
+import webhooks
+from scraper import (
+    PRODUCTS,
+    SCHEDULER_TICK_SECONDS,
+    LAST_SNAPSHOTS,
+    CATALOG_SNAPSHOTS,
+    PENDING_STATES,
+    load_custom_products,
+    generate_product_key,
+    detect_site_from_url,
+    get_product_name_from_url,
+    get_stock_for_url,
+    canonical_url,
+    get_cache_stats,
+)
+
+# ==========================
+# CONFIG
+# ==========================
+
+TOKEN = os.environ.get("DISCORD_TOKEN")
+CHANNEL_ID = 1466324052837798005  # channel for alerts
+OWNER_ID = 930917065487958036  # REPLACE WITH YOUR DISCORD USER ID
+
+# ==========================
+# BOT SETUP
+# ==========================
+
+class StockBot(commands.Bot):
+    async def setup_hook(self):
+        """One-time startup, run once after login (on_ready fires again on every reconnect)"""
+        # Load custom products before starting
+        load_custom_products()
+        subscriptions.load()
+        
+        # Sync commands
+        try:
+            synced = await self.tree.sync()
+            print(f"Synced {len(synced)} command(s)")
+        except Exception as e:
+            print(f"Failed to sync commands: {e}")
+        
+        # Start the stock check loop
+        if shards.SCRAPER_WORKERS:
+            # Worker processes do the checking; this process only sends their alerts
+            shards.start_workers(handle_worker_record)
+        else:
+            check_stock_loop.start()
+        if not history_maintenance_loop.is_running():
+            history_maintenance_loop.start()
+        await metrics.start_server()
+        metrics.start_lag_monitor()
+
+    async def close(self):
+        # Workers exit when their stdin closes; wait for them so none outlives the bot
+        if shards.running():
+            await shards.stop_workers()
+        check_stock_loop.cancel()
+        # Whatever the last sweep queued would otherwise be lost, and diffed again on restart
+        scraper.flush_states()
+        scraper.shutdown_parse_pool()
+        await fetcher.close()
+        await super().close()
+
+intents = discord.Intents.default()
+bot = StockBot(command_prefix="!", intents=intents)
+
+async def send_alert(target, text):
+    """Deliver one queued alert message to a Discord channel or a user's DMs"""
+    kind, target_id = target
+    try:
+        if kind == "user":
+            destination = bot.get_user(target_id) or await bot.fetch_user(target_id)
+        else:
+            destination = bot.get_channel(target_id) or await bot.fetch_channel(target_id)
+        await destination.send(text)
+    except (discord.Forbidden, discord.NotFound) as e:
+        raise dispatch.PermanentSendError(str(e))
+
+dispatch.set_sender(send_alert)
+
+# With ALERT_WEBHOOK_URLS set, the main alerts go to those webhooks instead of CHANNEL_ID
+WEBHOOK_TARGETS = webhooks.load_webhooks()
+
+# ==========================
+# EVENTS
+# ==========================
+
+@bot.event
+async def on_ready():
+    print(f"Logged in as {bot.user}")
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    # Measured from when Discord created the interaction, so it includes the round trip
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    metrics.observe("command_seconds", elapsed, command=command.qualified_name)
+
+# ==========================
+# ALERTS
+# ==========================
+
+def get_alert_recipients(product_id, product, flavors):
+    """{target: flavors} for one change: the main alert channel plus every matching subscriber"""
+    recipients = subscriptions.resolve(product_id, product["site"], flavors)
+    main_targets = WEBHOOK_TARGETS or ([("channel", CHANNEL_ID)] if CHANNEL_ID else [])
+    for target in main_targets:
+        recipients.setdefault(target, set()).update(flavors)
+    return recipients
+
+def queue_stock_alerts(diff):
+    """Turn one stock change into restock / sell-out messages for everyone following it"""
+    product = PRODUCTS.get(diff["product"])
+    if product is None:
+        return
+    dispatch.queue_diff_alerts(
+        diff, lambda flavors: get_alert_recipients(diff["product"], product, flavors)
+    )
+
+scraper.add_diff_listener(queue_stock_alerts)
+
+# ==========================
+# BACKGROUND LOOPS
+# ==========================
+
+@tasks.loop(seconds=SCHEDULER_TICK_SECONDS)
+async def check_stock_loop():
+    await scraper.run_sweep()
+    # Alerts go out in the background, merged per channel, so slow sends never delay the next tick
+    dispatch.flush()
+
+def apply_worker_diff(diff):
+    """Mirror a worker's stock change in this process's copy of the product"""
+    product = PRODUCTS.get(diff["product"])
+    if product is None:
+        return
+    product["last_stock"] = (set(product["last_stock"]) | set(diff["restocked"])) - set(diff["sold_out"])
+    if diff["price"] != "Unknown":
+        product["last_price"] = diff["price"]
+    product["initialized"] = True
+    search.add_flavors(diff["product"], diff["restocked"])
+
+# shard -> {host: health summary} from that worker's last sweep record
+WORKER_HOST_HEALTH = {}
+
+def get_host_health():
+    """Host health of this process and every scraper worker, the worst reading per host"""
+    merged = {host: dict(health) for host, health in fetcher.get_host_health().items()}
+    for hosts in WORKER_HOST_HEALTH.values():
+        for host, health in hosts.items():
+            current = merged.get(host)
+            if current is None:
+                merged[host] = dict(health)
+                continue
+            current["open"] = current["open"] or health["open"]
+            for field in ("failures", "latency", "timeout"):
+                # Latency is None until a host has answered once
+                readings = [value for value in (current[field], health[field]) if value is not None]
+                current[field] = max(readings) if readings else None
+            for field in ("requests", "errors", "rejected"):
+                current[field] += health[field]
+    return merged
+
+def collect_worker_gauges():
+    """Circuit and timeout gauges for the hosts each scraper worker fetches from"""
+    gauges = []
+    for shard, hosts in WORKER_HOST_HEALTH.items():
+        for host, health in hosts.items():
+            labels = {"host": host, "shard": str(shard)}
+            gauges.append(("host_circuit_open", labels, int(health["open"])))
+            gauges.append(("host_timeout_seconds", labels, health["timeout"]))
+    return gauges
+
+metrics.register_collector(collect_worker_gauges)
+
+def handle_worker_record(record):
+    """One JSON line from a scraper worker"""
+    kind = record.get("type")
+    if kind == "diff":
+        apply_worker_diff(record)
+        queue_stock_alerts(record)
+    elif kind == "sweep":
+        # The worker's fetch, parse, diff and sweep metrics since its previous sweep
+        metrics.merge_changes(record.get("metrics", []))
+        WORKER_HOST_HEALTH[record["shard"]] = record.get("hosts", {})
+        dispatch.flush()
+    elif kind == "ready":
+        print(f"Scraper worker {record['shard']} is watching {record['products']} products")
+
+@tasks.loop(hours=6)
+async def history_maintenance_loop():
+    """Apply history retention and compaction in the background"""
+    try:
+        # Seconds of SQLite work on a big log: keep it off the event loop
+        deleted = await asyncio.to_thread(history.compact)
+        if deleted:
+            print(f"History compaction removed {deleted} events")
+    except Exception as e:
+        print(f"Error compacting history: {e}")
+
+# ==========================
+# SLASH COMMANDS
+# ==========================
+
+def find_product(query):
+    """Look up a watched product by ID or (case-insensitive) name"""
+    query = query.strip()
+    if query in PRODUCTS:
+        return query, PRODUCTS[query]
+    lowered = query.lower()
+    for key, product in PRODUCTS.items():
+        if product["name"].lower() == lowered:
+            return key, product
+    for key in search.search(query, 1):
+        if key in PRODUCTS:
+            return key, PRODUCTS[key]
+    return None, None
+
+def format_supported_sites():
+    return "\n".join(f"• {host}" for host in scraper.supported_hosts())
+
+def format_duration(seconds):
+    """Short human readable duration like 3d 4h or 25m"""
+    seconds = int(seconds)
+    if seconds >= 86400:
+        return f"{seconds // 86400}d {seconds % 86400 // 3600}h"
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    return f"{max(1, seconds // 60)}m"
+
+async def product_autocomplete(interaction: discord.Interaction, current: str):
+    """Suggest watched products by name, ID or flavor as the user types"""
+    choices = []
+    for key in search.search(current, 25):
+        name = PRODUCTS[key]["name"] if key in PRODUCTS else key
+        # Discord caps choice names at 100 characters
+        if len(name) > 100:
+            name = name[:97] + "..."
+        choices.append(app_commands.Choice(name=name, value=key))
+    return choices
+
+@bot.tree.command(name="stock", description="Check vape stock")
+@app_commands.describe(product="Product name, ID or flavor")
+@app_commands.autocomplete(product=product_autocomplete)
+async def stock(interaction: discord.Interaction, product: str):
+    product_id, data = find_product(product)
+    if not data:
+        await interaction.response.send_message(
+            f"❌ **Not found:** No monitored product matches `{product}`.",
+            ephemeral=True
+        )
+        return
+
+    # Scraping can outlast the 3s interaction window, so acknowledge first
+    await interaction.response.defer()
+
+    # One fetch and one parse for everything shown below
+    stock_data = await get_stock_for_url(data["url"])
+    flavors = stock_data["flavors"]
+    price = stock_data["price"]
+    inventory_info = stock_data["inventory_info"]
+
+    if flavors:
+        msg = (
+            "```"
+            f"{data['name']}\n"
+            f"Price: {price}\n"
+        )
+        
+        if inventory_info:
+            msg += f"Inventory: {inventory_info}\n"
+            
+        msg += (
+            "IN STOCK:\n"
+            + "\n".join(f"- {f}" for f in sorted(flavors))
+            + "```"
+            f"\n🔗 {data['url']}"
+        )
+    else:
+        msg = (
+            f"**{data['name']}**\n"
+            f"💲 **Price:** {price}\n"
+        )
+        
+        if inventory_info:
+            msg += f"📦 **Inventory:** {inventory_info}\n"
+            
+        msg += f"🔗 {data['url']}\n"
+        if stock_data["unknown"]:
+            msg += "⚠️ **Couldn't reach the store right now, stock is unknown**"
+        else:
+            msg += "❌ **All flavors/variants are OUT OF STOCK**"
+
+    await interaction.followup.send(msg)
+
+@bot.tree.command(name="sync", description="Sync slash commands (Owner only)")
+async def sync(interaction: discord.Interaction):
+    """Sync slash commands to Discord"""
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
+        return
+    
+    await interaction.response.defer(ephemeral=True)
+    try:
+        synced = await bot.tree.sync()
+        await interaction.followup.send(f"✅ Synced {len(synced)} commands globally.", ephemeral=True)
+        print(f"Synced {len(synced)} commands")
+    except Exception as e:
+        await interaction.followup.send(f"❌ Error syncing commands: {e}", ephemeral=True)
+
+@bot.tree.command(name="addurl", description="Add a new product URL to monitor")
+@app_commands.describe(url="The product URL to monitor")
+async def addurl(interaction: discord.Interaction, url: str):
+    # Validate URL (no canonical form means a malformed one, e.g. a bad port)
+    page_url = canonical_url(url)
+    if page_url is None or detect_site_from_url(url) == scraper.UNKNOWN_SITE:
+        await interaction.response.send_message(
+            f"❌ **Error:** Only the following sites are supported:\n{format_supported_sites()}",
+            ephemeral=True
+        )
+        return
+    
+    # Check if this page is already watched, however its URL was written
+    for existing_product in PRODUCTS.values():
+        if canonical_url(existing_product["url"]) == page_url:
+            await interaction.response.send_message(
+                f"❌ **Already monitoring:** This URL is already being monitored as '{existing_product['name']}'",
+                ephemeral=True
+            )
+            return
+    
+    # Get product name
+    await interaction.response.defer()
+    
+    try:
+        name = await get_product_name_from_url(url)
+        product_key = generate_product_key(url)
+        
+        # Add to PRODUCTS, routed to its site adapter once here
+        PRODUCTS[product_key] = {
+            "name": name,
+            "url": url,
+            "last_stock": set(),
+            "initialized": False,
+            "is_custom": True,
+        }
+        site = scraper.route_product(PRODUCTS[product_key])
+        
+        # Save to the state store
+        store.save_product(product_key, PRODUCTS[product_key])
+        
+        # /stock autocomplete reads the index, no command re-sync needed
+        search.index_product(product_key, name)
+        shards.product_added(product_key, PRODUCTS[product_key])
+        
+        await interaction.followup.send(
+            f"✅ **Added to monitoring:** {name}\n"
+            f"🌐 **Site:** {scraper.SITE_ADAPTERS[site]['label']}\n"
+            f"🔗 {url}\n"
+            f"📊 This product will now be checked for stock changes (more often while it's restocking).\n"
+            f"🆔 Product ID: `{product_key}`\n"
+            f"📝 Use `/listcustom` to see all custom products."
+        )
+        
+    except Exception as e:
+        await interaction.followup.send(
+            f"❌ **Error adding URL:** {str(e)}",
+            ephemeral=True
+        )
+
+@bot.tree.command(name="stockurl", description="Check stock for any supported URL")
+@app_commands.describe(url="The product URL to check")
+async def stockurl(interaction: discord.Interaction, url: str):
+    # Validate URL
+    if canonical_url(url) is None or detect_site_from_url(url) == scraper.UNKNOWN_SITE:
+        await interaction.response.send_message(
+            f"❌ **Error:** Only the following sites are supported:\n{format_supported_sites()}",
+            ephemeral=True
+        )
+        return
+    
+    await interaction.response.defer()
+    
+    try:
+        stock_data = await get_stock_for_url(url)
+        flavors = stock_data["flavors"]
+        
+        if flavors:
+            msg = (
+                "```"
+                f"{stock_data['name']}\n"
+                f"Price: {stock_data['price']}\n"
+            )
+            
+            if stock_data["inventory_info"]:
+                msg += f"Inventory: {stock_data['inventory_info']}\n"
+                
+            msg += (
+                "IN STOCK:\n"
+                + "\n".join(f"- {f}" for f in sorted(flavors))
+                + "```"
+                f"\n🔗 {url}"
+            )
+        else:
+            msg = (
+                f"**{stock_data['name']}**\n"
+                f"💲 **Price:** {stock_data['price']}\n"
+            )
+            
+            if stock_data["inventory_info"]:
+                msg += f"📦 **Inventory:** {stock_data['inventory_info']}\n"
+                
+            msg += f"🔗 {url}\n"
+            if stock_data["unknown"]:
+                msg += "⚠️ **Couldn't reach the store right now, stock is unknown**"
+            else:
+                msg += "❌ **All flavors/variants are OUT OF STOCK**"
+        
+        await interaction.followup.send(msg)
+        
+    except Exception as e:
+        await interaction.followup.send(
+            f"❌ **Error checking URL:** {str(e)}\n"
+            f"Make sure the URL is a valid product page from a supported site.",
+            ephemeral=True
+        )
+
+@bot.tree.command(name="listcustom", description="List all custom products being monitored")
+async def listcustom(interaction: discord.Interaction):
+    custom_products = []
+    for key, product in PRODUCTS.items():
+        if product.get("is_custom", False):
+            site_emoji = scraper.SITE_ADAPTERS.get(product.get("site"), {}).get("emoji", "🛒")
+            custom_products.append(
+                f"• **{product['name']}**\n"
+                f"  {site_emoji} {product.get('site', 'unknown').title()}\n"
+                f"  🔗 {product['url']}\n"
+                f"  🆔 `{key}`"
+            )
+    
+    if custom_products:
+        msg = "**Custom Products Being Monitored:**\n\n" + "\n\n".join(custom_products)
+    else:
+        msg = "No custom products are being monitored yet. Use `/addurl` to add one."
+    
+    await interaction.response.send_message(msg, ephemeral=True)
+
+@bot.tree.command(name="removeurl", description="Remove a custom product from monitoring")
+@app_commands.describe(product_id="The product ID to remove (use /listcustom to see IDs)")
+async def removeurl(interaction: discord.Interaction, product_id: str):
+    if product_id in PRODUCTS and PRODUCTS[product_id].get("is_custom", False):
+        product_name = PRODUCTS[product_id]["name"]
+        del PRODUCTS[product_id]
+        LAST_SNAPSHOTS.pop(product_id, None)
+        CATALOG_SNAPSHOTS.pop(product_id, None)
+        PENDING_STATES.pop(product_id, None)
+        store.delete_product(product_id)
+        subscriptions.remove_product(product_id)
+        search.remove_product(product_id)
+        shards.product_removed(product_id)
+        
+        await interaction.response.send_message(
+            f"✅ **Removed:** {product_name} is no longer being monitored.",
+            ephemeral=True
+        )
+    else:
+        await interaction.response.send_message(
+            f"❌ **Not found:** No custom product with ID `{product_id}`.\n"
+            f"Use `/listcustom` to see available IDs.",
+            ephemeral=True
+        )
+
+@bot.tree.command(name="history", description="Show recent stock changes for a product")
+@app_commands.describe(product="Product ID or name", days="How many days back to look (default 7)")
+@app_commands.autocomplete(product=product_autocomplete)
+async def history_cmd(interaction: discord.Interaction, product: str, days: int = 7):
+    product_id, data = find_product(product)
+    if not data:
+        await interaction.response.send_message(
+            f"❌ **Not found:** No monitored product matches `{product}`.",
+            ephemeral=True
+        )
+        return
+
+    since = time.time() - days * 86400
+    counts = history.count_events(product_id, since)
+    events = history.recent_events(product_id, since)
+
+    msg = (
+        f"📈 **{data['name']}** – last {days} days\n"
+        f"🚨 Restocks: {counts.get(history.RESTOCKED, 0)} · "
+        f"❌ Sell-outs: {counts.get(history.SOLD_OUT, 0)} · "
+        f"💲 Price changes: {counts.get(history.PRICE_CHANGED, 0)}\n"
+    )
+    if events:
+        lines = []
+        for ts, kind, flavor, value in events:
+            when = time.strftime("%Y-%m-%d %H:%M", time.gmtime(ts))
+            if kind == history.PRICE_CHANGED:
+                lines.append(f"{when}  price → {value}")
+            else:
+                lines.append(f"{when}  {'+' if kind == history.RESTOCKED else '-'} {flavor}")
+        msg += "```" + "\n".join(lines) + "```"
+    else:
+        msg += "No stock changes recorded in this period."
+
+    await interaction.response.send_message(msg[:2000])
+
+@bot.tree.command(name="restocks", description="Per-flavor restock frequency for a product")
+@app_commands.describe(product="Product ID or name", days="How many days back to look (default 30)")
+@app_commands.autocomplete(product=product_autocomplete)
+async def restocks_cmd(interaction: discord.Interaction, product: str, days: int = 30):
+    product_id, data = find_product(product)
+    if not data:
+        await interaction.response.send_message(
+            f"❌ **Not found:** No monitored product matches `{product}`.",
+            ephemeral=True
+        )
+        return
+
+    stats = history.flavor_restock_stats(product_id, time.time() - days * 86400)
+    if not stats:
+        await interaction.response.send_message(f"**{data['name']}**: no restocks recorded in the last {days} days.")
+        return
+
+    lines = []
+    for flavor, restocks, avg_in_stock, last_restock in stats:
+        per_week = restocks / max(days / 7, 1)
+        stays = format_duration(avg_in_stock) if avg_in_stock else "?"
+        last = time.strftime("%m-%d", time.gmtime(last_restock))
+        lines.append(f"- {flavor}: {restocks}x ({per_week:.1f}/wk), stays ~{stays}, last {last}")
+
+    msg = f"📊 **{data['name']}** restocks, last {days} days (UTC)\n```" + "\n".join(lines) + "```"
+    if len(msg) > 2000:
+        msg = msg[:1990] + "\n…```"
+    await interaction.response.send_message(msg)
+
+def get_subscription_target(interaction, where):
+    """Where a subscription delivers: this channel (needs Manage Channels) or the user's DMs
+
+    Returns (target, error message).
+    """
+    if where == "here" and interaction.guild is not None:
+        if not interaction.permissions.manage_channels:
+            return None, "❌ You need **Manage Channels** to subscribe this channel. Use `where: DM` instead."
+        return ("channel", interaction.channel_id), None
+    return ("user", interaction.user.id), None
+
+def describe_subscription(scope, flavor):
+    """Readable summary of a subscription's scope and flavor filter"""
+    kind, value = scope
+    if kind == "product":
+        what = PRODUCTS[value]["name"] if value in PRODUCTS else f"product {value}"
+    elif kind == "site":
+        what = f"everything on {value}"
+    else:
+        what = "every product"
+    return f"{what} – {flavor}" if flavor else what
+
+@bot.tree.command(name="subscribe", description="Get alerts for a product, a site or matching flavors")
+@app_commands.describe(
+    product="Product ID or name (leave empty for all products)",
+    site="Follow every product on one site instead",
+    flavor="Only these flavors, wildcards allowed (e.g. *mint*)",
+    where="Send alerts to your DMs or to this channel"
+)
+@app_commands.choices(
+    site=[app_commands.Choice(name=s, value=s) for s in scraper.SITE_ADAPTERS],
+    where=[app_commands.Choice(name="DM", value="dm"), app_commands.Choice(name="This channel", value="here")]
+)
+@app_commands.autocomplete(product=product_autocomplete)
+async def subscribe_cmd(interaction: discord.Interaction, product: str = None,
+                        site: app_commands.Choice[str] = None, flavor: str = None,
+                        where: app_commands.Choice[str] = None):
+    if product and site:
+        await interaction.response.send_message("❌ Pick either a product or a site, not both.", ephemeral=True)
+        return
+
+    target, error = get_subscription_target(interaction, where.value if where else "dm")
+    if error:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
+
+    if product:
+        product_id, data = find_product(product)
+        if not data:
+            await interaction.response.send_message(
+                f"❌ **Not found:** No monitored product matches `{product}`.",
+                ephemeral=True
+            )
+            return
+        scope = ("product", product_id)
+    elif site:
+        scope = ("site", site.value)
+    else:
+        scope = ("all", "")
+
+    sub_id, created = subscriptions.add(target, scope, flavor)
+    if sub_id is None:
+        await interaction.response.send_message(
+            f"❌ Subscription limit reached ({subscriptions.MAX_SUBSCRIPTIONS_PER_TARGET}). "
+            f"Remove some with `/unsubscribe`.",
+            ephemeral=True
+        )
+        return
+
+    destination = "your DMs" if target[0] == "user" else "this channel"
+    status = "Subscribed" if created else "Already subscribed"
+    await interaction.response.send_message(
+        f"🔔 **{status}** (#{sub_id}): {describe_subscription(scope, (flavor or '').strip())} → {destination}",
+        ephemeral=True
+    )
+
+@bot.tree.command(name="unsubscribe", description="Remove one of your subscriptions")
+@app_commands.describe(subscription_id="The subscription number (use /subscriptions to see them)")
+async def unsubscribe_cmd(interaction: discord.Interaction, subscription_id: int):
+    sub = subscriptions.SUBSCRIPTIONS.get(subscription_id)
+    allowed = sub is not None and (
+        sub[0] == ("user", interaction.user.id)
+        or (sub[0] == ("channel", interaction.channel_id) and interaction.permissions.manage_channels)
+    )
+    if not allowed:
+        await interaction.response.send_message(
+            f"❌ **Not found:** You have no subscription #{subscription_id} here.\n"
+            f"Use `/subscriptions` to see yours.",
+            ephemeral=True
+        )
+        return
+
+    subscriptions.remove(subscription_id)
+    await interaction.response.send_message(f"🔕 **Removed** subscription #{subscription_id}.", ephemeral=True)
+
+@bot.tree.command(name="subscriptions", description="List your subscriptions and this channel's")
+async def subscriptions_cmd(interaction: discord.Interaction):
+    sections = [("Your DMs", subscriptions.for_target(("user", interaction.user.id)))]
+    if interaction.guild is not None:
+        sections.append(("This channel", subscriptions.for_target(("channel", interaction.channel_id))))
+
+    msg = ""
+    for title, subs in sections:
+        if subs:
+            msg += f"**{title}**\n" + "\n".join(
+                f"#{sub_id} – {describe_subscription(scope, flavor)}" for sub_id, scope, flavor in subs
+            ) + "\n\n"
+    if not msg:
+        msg = "No subscriptions yet. Use `/subscribe` to follow a product, a site or some flavors."
+
+    await interaction.response.send_message(msg[:2000], ephemeral=True)
+
+def format_ms(seconds):
+    if seconds is None:
+        return "-"
+    if seconds == float("inf"):
+        return ">60s"
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.1f}s"
+
+def format_stats():
+    """Plain-text summary of the pipeline metrics for /stats"""
+    lines = []
+    count, mean, _, p95 = metrics.histogram_stats("sweep_seconds")
+    lines.append(f"Sweeps: {count}, mean {format_ms(mean)}, p95 {format_ms(p95)}, "
+                 f"{metrics.total('sweep_products_total'):.0f} product checks")
+
+    lines.append("")
+    lines.append("Stage mean/p95 by site:")
+    for site in metrics.label_values("diff_seconds", "site") or ["-"]:
+        _, parse_mean, _, parse_p95 = metrics.histogram_stats("parse_seconds", site=site)
+        _, diff_mean, _, diff_p95 = metrics.histogram_stats("diff_seconds", site=site)
+        lines.append(f"  {site}: parse {format_ms(parse_mean)}/{format_ms(parse_p95)}, "
+                     f"diff {format_ms(diff_mean)}/{format_ms(diff_p95)}")
+
+    lines.append("")
+    lines.append("Fetch by host:")
+    for host, health in get_host_health().items():
+        _, fetch_mean, _, fetch_p95 = metrics.histogram_stats("fetch_seconds", host=host)
+        lines.append(
+            f"  {host}: {metrics.total('requests_total', host=host):.0f} req, "
+            f"{metrics.total('fetch_errors_total', host=host):.0f} err, "
+            f"{metrics.total('response_bytes_total', host=host) / 1e6:.1f} MB, "
+            f"{format_ms(fetch_mean)}/{format_ms(fetch_p95)}, timeout {format_ms(health['timeout'])}"
+            + (" [CIRCUIT OPEN]" if health["open"] else "")
+        )
+
+    cache = get_cache_stats()
+    alerts = dispatch.get_dispatch_stats()
+    _, _, _, latency_p95 = metrics.histogram_stats("dispatch_latency_seconds")
+    _, _, _, send_p95 = metrics.histogram_stats("dispatch_send_seconds")
+    _, lag_mean, _, lag_p95 = metrics.histogram_stats("event_loop_lag_seconds")
+    _, command_mean, _, command_p95 = metrics.histogram_stats("command_seconds")
+    lines.append("")
+    lines.append(f"Cache: {cache['hit_ratio']:.0%} hit ratio, {cache['entries']} entries")
+    lines.append(f"Alerts: {alerts['sent']} sent, {alerts['failed']} failed, {alerts['queue_depth']} queued, "
+                 f"send p95 {format_ms(send_p95)}, delivery p95 {format_ms(latency_p95)}")
+    lines.append(f"Commands: mean {format_ms(command_mean)}, p95 {format_ms(command_p95)}")
+    lines.append(f"Event loop lag: mean {format_ms(lag_mean)}, p95 {format_ms(lag_p95)}")
+    if shards.running():
+        workers = shards.get_worker_stats()
+        lines.append(f"Workers: {sum(1 for w in workers.values() if w['pid'])}/{len(workers)} running, "
+                     f"{sum(w['restarts'] for w in workers.values())} restarts")
+    return "\n".join(lines)
+
+@bot.tree.command(name="stats", description="Scraping pipeline statistics (Owner only)")
+async def stats_cmd(interaction: discord.Interaction):
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
+        return
+
+    msg = "📊 **Pipeline stats**\n```" + format_stats() + "```"
+    if len(msg) > 2000:
+        msg = msg[:1990] + "\n…```"
+    await interaction.response.send_message(msg, ephemeral=True)
+
+@bot.tree.command(name="help", description="Show commands")
+async def help_cmd(interaction: discord.Interaction):
+    await interaction.response.send_message(
+        "**Commands**\n"
+        "/stock – Check pre-defined product stock (includes custom products)\n"
+        "/stockurl – Check stock for any supported URL\n"
+        "/addurl – Add a new product URL to monitor\n"
+        "/listcustom – List all custom products being monitored\n"
+        "/removeurl – Remove a custom product from monitoring\n"
+        "/history – Recent stock changes for a product\n"
+        "/restocks – Per-flavor restock frequency for a product\n"
+        "/subscribe – Get alerts for a product, a site or matching flavors\n"
+        "/unsubscribe – Remove a subscription\n"
+        "/subscriptions – List your subscriptions\n"
+        "/sync – Sync commands (Owner only)\n"
+        "/stats – Scraping pipeline statistics (Owner only)\n"
+        "/help – Show this menu\n\n"
+        "**Supported Sites:**\n"
+        f"{format_supported_sites()}\n\n"
+        "**Note:** Custom products added via `/addurl` show up in `/stock` suggestions right away!",
+        ephemeral=True
+    )
+
+# ==========================
+# START BOT
+# ==========================
+
+def main():
+    # IMPORTANT: Replace with your Discord User ID
+    print("WARNING: Please replace OWNER_ID with your Discord User ID!")
+    print("Find your Discord ID: User Settings → Advanced → Developer Mode ON → Right-click your profile → Copy ID")
+    
+    if OWNER_ID == 123456789012345678:
+        print("\n❌ ERROR: You must replace OWNER_ID with your actual Discord User ID!")
+        print("The bot will still run, but /sync command won't work.")
+    
+    bot.run(TOKEN)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import sqlite3
+
+# ==========================
+# CONFIG
+# ==========================
+
+# SQLite database holding custom products and every product's last known stock
+STATE_DB_FILE = os.environ.get("STATE_DB_FILE", "stock_state.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    site TEXT NOT NULL,
+    added_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS product_state (
+    key TEXT PRIMARY KEY,
+    last_stock TEXT NOT NULL,
+    price TEXT,
+    initialized INTEGER NOT NULL,
+    checked_at REAL NOT NULL
+);
+"""
+
+# ==========================
+# STATE STORE
+# ==========================
+
+_conn = None
+
+def open_connection():
+    """A new connection to the state database (background jobs use their own)"""
+    conn = sqlite3.connect(STATE_DB_FILE)
+    # Only takes effect on a new database; lets history compaction return space cheaply
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Durable at checkpoints, a crash can only lose the last commit or two
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def get_connection():
+    """Open the state database on first use (WAL so reads never block the writer)"""
+    global _conn
+    if _conn is None:
+        _conn = open_connection()
+        _conn.executescript(SCHEMA)
+        _conn.commit()
+    return _conn
+
+def close():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
+
+def load_products():
+    """Return {key: product} for every custom product"""
+    rows = get_connection().execute("SELECT key, name, url, site FROM products ORDER BY added_at")
+    return {
+        key: {"name": name, "url": url, "site": site}
+        for key, name, url, site in rows
+    }
+
+def save_product(key, product):
+    """Insert or update one custom product"""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO products (key, name, url, site, added_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET name = excluded.name, url = excluded.url, site = excluded.site",
+            (key, product["name"], product["url"], product.get("site", "unknown"), time.time())
+        )
+
+def delete_product(key):
+    """Remove a custom product and its stock state"""
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM products WHERE key = ?", (key,))
+        conn.execute("DELETE FROM product_state WHERE key = ?", (key,))
+
+def has_products():
+    return get_connection().execute("SELECT 1 FROM products LIMIT 1").fetchone() is not None
+
+def load_states():
+    """Return {key: {"last_stock", "price", "initialized", "checked_at"}} for every product"""
+    rows = get_connection().execute(
+        "SELECT key, last_stock, price, initialized, checked_at FROM product_state"
+    )
+    return {
+        key: {
+            "last_stock": set(json.loads(last_stock)),
+            "price": price,
+            "initialized": bool(initialized),
+            "checked_at": checked_at,
+        }
+        for key, last_stock, price, initialized, checked_at in rows
+    }
+
+def save_states(states):
+    """Upsert many (key, last_stock, price, initialized, checked_at) rows in one transaction"""
+    if not states:
+        return
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO product_state (key, last_stock, price, initialized, checked_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET last_stock = excluded.last_stock, price = excluded.price, "
+            "initialized = excluded.initialized, checked_at = excluded.checked_at",
+            [
+                (key, json.dumps(sorted(last_stock)), price, int(initialized), checked_at)
+                for key, last_stock, price, initialized, checked_at in states
+            ]
+        )
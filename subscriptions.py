@@ -0,0 +1,200 @@
+import os
+import re
+import time
+import fnmatch
+import store
+
+# ==========================
+# CONFIG
+# ==========================
+
+MAX_SUBSCRIPTIONS_PER_TARGET = int(os.environ.get("MAX_SUBSCRIPTIONS_PER_TARGET", "50"))
+
+# A target is ("channel", channel_id) or ("user", user_id).
+# A scope is ("product", product_key), ("site", site) or ("all", "").
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    id INTEGER PRIMARY KEY,
+    target_kind TEXT NOT NULL,
+    target_id INTEGER NOT NULL,
+    scope_kind TEXT NOT NULL,
+    scope_value TEXT NOT NULL,
+    flavor TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    UNIQUE (target_kind, target_id, scope_kind, scope_value, flavor)
+);
+
+CREATE INDEX IF NOT EXISTS subscriptions_scope ON subscriptions (scope_kind, scope_value);
+"""
+
+# ==========================
+# SUBSCRIPTION INDEX
+# ==========================
+
+_ready = False
+_loaded = False
+
+# id -> (target, scope, flavor)
+SUBSCRIPTIONS = {}
+
+# target -> {id}
+BY_TARGET = {}
+
+# Inverted index, so routing a diff only touches subscriptions that can match it:
+#   scope -> {id} for "every flavor" subscriptions
+#   (scope, lowercased flavor) -> {id} for exact flavor subscriptions
+#   (scope, lowercased pattern) -> {id} for wildcard flavor subscriptions
+#   (scope, trigram) -> {pattern: compiled} for the patterns worth trying on a flavor
+ANY_FLAVOR = {}
+EXACT_FLAVOR = {}
+FLAVOR_PATTERNS = {}
+PATTERN_KEYS = {}
+
+# Wildcards and [...] classes; what's left between them must appear in a matching flavor
+PATTERN_SYNTAX = re.compile(r"[*?]|\[!?\]?[^\]]*\]")
+
+def get_connection():
+    global _ready
+    conn = store.get_connection()
+    if not _ready:
+        conn.executescript(SCHEMA)
+        conn.commit()
+        _ready = True
+    return conn
+
+def is_pattern(flavor):
+    return any(c in flavor for c in "*?[")
+
+def pattern_key(pattern):
+    """First trigram of a pattern's longest literal run ("" when it has none that long)
+
+    Every flavor the pattern matches contains that literal, so the pattern
+    only needs trying on flavors that contain its key.
+    """
+    literal = max(PATTERN_SYNTAX.split(pattern), key=len)
+    return literal[:3] if len(literal) >= 3 else ""
+
+def flavor_keys(lowered):
+    """Keys of every pattern that could match a lowercased flavor"""
+    return {""} | {lowered[i:i + 3] for i in range(len(lowered) - 2)}
+
+def index_subscription(sub_id, target, scope, flavor):
+    SUBSCRIPTIONS[sub_id] = (target, scope, flavor)
+    BY_TARGET.setdefault(target, set()).add(sub_id)
+    if not flavor:
+        ANY_FLAVOR.setdefault(scope, set()).add(sub_id)
+    elif is_pattern(flavor):
+        pattern = flavor.lower()
+        FLAVOR_PATTERNS.setdefault((scope, pattern), set()).add(sub_id)
+        patterns = PATTERN_KEYS.setdefault((scope, pattern_key(pattern)), {})
+        if pattern not in patterns:
+            patterns[pattern] = re.compile(fnmatch.translate(pattern))
+    else:
+        EXACT_FLAVOR.setdefault((scope, flavor.lower()), set()).add(sub_id)
+
+def unindex_subscription(sub_id):
+    target, scope, flavor = SUBSCRIPTIONS.pop(sub_id)
+    discard_from(BY_TARGET, target, sub_id)
+    if not flavor:
+        discard_from(ANY_FLAVOR, scope, sub_id)
+    elif is_pattern(flavor):
+        pattern = flavor.lower()
+        discard_from(FLAVOR_PATTERNS, (scope, pattern), sub_id)
+        if (scope, pattern) not in FLAVOR_PATTERNS:
+            # Last subscription with this pattern in this scope
+            discard_from(PATTERN_KEYS, (scope, pattern_key(pattern)), pattern)
+    else:
+        discard_from(EXACT_FLAVOR, (scope, flavor.lower()), sub_id)
+
+def discard_from(index, key, item):
+    """Remove an id (or pattern) from one index bucket, dropping the bucket once it is empty"""
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    if isinstance(bucket, dict):
+        bucket.pop(item, None)
+    else:
+        bucket.discard(item)
+    if not bucket:
+        del index[key]
+
+def load():
+    """Build the in-memory index from the database (once)"""
+    global _loaded
+    if _loaded:
+        return
+    rows = get_connection().execute(
+        "SELECT id, target_kind, target_id, scope_kind, scope_value, flavor FROM subscriptions"
+    )
+    for sub_id, target_kind, target_id, scope_kind, scope_value, flavor in rows:
+        index_subscription(sub_id, (target_kind, target_id), (scope_kind, scope_value), flavor)
+    _loaded = True
+
+def add(target, scope, flavor=""):
+    """Subscribe a target; returns (id, created) or (None, False) when over the limit"""
+    load()
+    flavor = (flavor or "").strip()
+    existing = BY_TARGET.get(target, set())
+    for sub_id in existing:
+        if SUBSCRIPTIONS[sub_id] == (target, scope, flavor):
+            return sub_id, False
+    if len(existing) >= MAX_SUBSCRIPTIONS_PER_TARGET:
+        return None, False
+
+    conn = get_connection()
+    with conn:
+        sub_id = conn.execute(
+            "INSERT INTO subscriptions (target_kind, target_id, scope_kind, scope_value, flavor, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (target[0], target[1], scope[0], scope[1], flavor, time.time())
+        ).lastrowid
+    index_subscription(sub_id, target, scope, flavor)
+    return sub_id, True
+
+def remove(sub_id):
+    """Delete one subscription; returns whether it existed"""
+    load()
+    if sub_id not in SUBSCRIPTIONS:
+        return False
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM subscriptions WHERE id = ?", (sub_id,))
+    unindex_subscription(sub_id)
+    return True
+
+def remove_product(product_key):
+    """Drop every subscription scoped to a product that is no longer watched"""
+    load()
+    scope = ("product", product_key)
+    for sub_id in [s for s, (_, sub_scope, _) in SUBSCRIPTIONS.items() if sub_scope == scope]:
+        unindex_subscription(sub_id)
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "DELETE FROM subscriptions WHERE scope_kind = ? AND scope_value = ?", scope
+        )
+
+def for_target(target):
+    """[(id, scope, flavor)] for one channel or user"""
+    load()
+    return sorted((sub_id,) + SUBSCRIPTIONS[sub_id][1:] for sub_id in BY_TARGET.get(target, ()))
+
+def resolve(product_key, site, flavors):
+    """Map changed flavors to the targets that follow them: {target: set(flavors)}"""
+    load()
+    recipients = {}
+    changed = [(flavor, flavor.lower()) for flavor in flavors]
+    keys = {lowered: flavor_keys(lowered) for _, lowered in changed} if PATTERN_KEYS else {}
+    for scope in (("product", product_key), ("site", site), ("all", "")):
+        for sub_id in ANY_FLAVOR.get(scope, ()):
+            recipients.setdefault(SUBSCRIPTIONS[sub_id][0], set()).update(flavors)
+        for flavor, lowered in changed:
+            for sub_id in EXACT_FLAVOR.get((scope, lowered), ()):
+                recipients.setdefault(SUBSCRIPTIONS[sub_id][0], set()).add(flavor)
+            # Only patterns whose literal part this flavor contains, each tried once
+            for key in keys.get(lowered, ()):
+                for pattern, compiled in PATTERN_KEYS.get((scope, key), {}).items():
+                    if compiled.match(lowered):
+                        for sub_id in FLAVOR_PATTERNS[(scope, pattern)]:
+                            recipients.setdefault(SUBSCRIPTIONS[sub_id][0], set()).add(flavor)
+    return recipients
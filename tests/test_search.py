@@ -0,0 +1,137 @@
+"""search.py against a linear scan over the same products.
+
+The postings, vocabularies, sorted name list and trigram index are only
+shortcuts: every query must return exactly what scanning every product
+would. Run with `python -m pytest tests`.
+"""
+import os
+import sys
+import random
+import heapq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search  # noqa: E402
+
+BRANDS = ["Geek Bar Pulse", "Geek Bar Meloso", "Foger Switch Pro", "Raz TN9000",
+          "Lost Mary MO5000", "Elf Bar BC5000", "Hero X", "Kado Bar"]
+FLAVORS = ["Mint", "Grape Ice", "Blue Razz", "Strawberry Banana", "Mango", "Watermelon Ice"]
+
+QUERIES = ["", "geek", "geek bar", "gek bar", "fogr swich", "rz tn900", "lost mery", "bar ice",
+           "mango", "grape", "elf", "tn9000", "hero x", "x", "xq", "p12", "kado bar mint", "pulse 1"]
+
+def reset():
+    search.ENTRIES.clear()
+    search.NAME_POSTINGS.clear()
+    search.FLAVOR_POSTINGS.clear()
+    search.NAME_VOCAB.clear()
+    search.FLAVOR_VOCAB.clear()
+    search.TRIGRAMS.clear()
+    search.BY_NAME.clear()
+
+def fill(count, seed=1):
+    reset()
+    rng = random.Random(seed)
+    for i in range(count):
+        name = f"{rng.choice(BRANDS)} {rng.choice(FLAVORS)} {i}"
+        search.index_product(f"p{i}", name, rng.sample(FLAVORS, 2))
+    return rng
+
+def linear_search(query, limit):
+    """search.search() written as scans over ENTRIES"""
+    entries = search.ENTRIES
+    by_name = sorted((entry["sort_name"], key) for key, entry in entries.items())
+    words = search.tokenize(query)
+    if not words:
+        return [key for _, key in by_name[:limit]]
+
+    lowered = query.strip().lower()
+    results = [lowered] if lowered in entries else []
+    for name, key in by_name:
+        if len(results) >= limit:
+            break
+        if name.startswith(lowered) and key not in results:
+            results.append(key)
+
+    def matches(key, fields):
+        tokens = set().union(*(entries[key][field] for field in fields))
+        return all(any(token.startswith(word) for token in tokens) for word in words)
+
+    for fields in (["name_tokens"], ["name_tokens", "flavor_tokens"]):
+        if len(results) < limit:
+            hits = [key for _, key in by_name if key not in results and matches(key, fields)]
+            results += hits[:limit - len(results)]
+
+    if not results:
+        grams = search.trigrams(query)
+        common = max(50, len(entries) // 10)
+        frequency = {gram: sum(gram in entry["trigrams"] for entry in entries.values()) for gram in grams}
+        for cutoff in (common, None):
+            counts = {
+                key: sum(gram in entry["trigrams"] and (cutoff is None or frequency[gram] <= cutoff)
+                         for gram in grams)
+                for key, entry in entries.items()
+            }
+            ranked = sorted((key for key, count in counts.items() if count >= 3),
+                            key=lambda key: (-counts[key], entries[key]["sort_name"]))
+            if ranked:
+                results = ranked[:limit]
+                break
+    return results
+
+def assert_index_consistent():
+    """Every index holds exactly what a rebuild from ENTRIES would"""
+    names, flavors, grams = {}, {}, {}
+    for key, entry in search.ENTRIES.items():
+        for token in entry["name_tokens"]:
+            names.setdefault(token, set()).add(key)
+        for token in entry["flavor_tokens"]:
+            flavors.setdefault(token, set()).add(key)
+        for gram in entry["trigrams"]:
+            grams.setdefault(gram, set()).add(key)
+    assert search.NAME_POSTINGS == names
+    assert search.FLAVOR_POSTINGS == flavors
+    assert search.TRIGRAMS == grams
+    assert search.NAME_VOCAB == sorted(names)
+    assert search.FLAVOR_VOCAB == sorted(flavors)
+    assert search.BY_NAME == sorted((entry["sort_name"], key) for key, entry in search.ENTRIES.items())
+
+def test_queries_match_linear_scan():
+    for count in (40, 600, 5000):
+        fill(count)
+        for query in QUERIES:
+            for limit in (1, 5, 25):
+                assert search.search(query, limit) == linear_search(query, limit), (count, query, limit)
+
+def test_typo_falls_back_to_common_trigrams():
+    fill(5000)
+    results = search.search("gek bar", 5)
+    assert len(results) == 5
+    assert all(search.ENTRIES[key]["sort_name"].startswith("geek bar") for key in results)
+
+def test_index_survives_removal_and_renames():
+    rng = fill(800, seed=2)
+    for i in rng.sample(range(800), 300):
+        search.remove_product(f"p{i}")
+    for i in rng.sample(range(800), 200):
+        search.index_product(f"p{i}", f"{rng.choice(BRANDS)} Renamed {i}", [rng.choice(FLAVORS)])
+    assert_index_consistent()
+    for query in QUERIES + ["renamed", "renamd bar"]:
+        assert search.search(query, 10) == linear_search(query, 10), query
+
+def test_prefix_matches_against_vocabulary_scan():
+    fill(600, seed=3)
+    for prefix in ["g", "ge", "geek", "b", "bc", "m", "mo5", "z", "1", "12"]:
+        expected = set()
+        for token, keys in search.NAME_POSTINGS.items():
+            if token.startswith(prefix):
+                expected |= keys
+        assert search.prefix_matches(search.NAME_POSTINGS, search.NAME_VOCAB, prefix) == expected
+
+def test_first_by_name_dense_and_sparse():
+    fill(1000, seed=4)
+    keys = list(search.ENTRIES)
+    for size in (3, 100, 400, 1000):
+        subset = set(random.Random(size).sample(keys, size))
+        expected = heapq.nsmallest(7, subset, key=lambda key: search.ENTRIES[key]["sort_name"])
+        assert search.first_by_name(subset, 7) == expected
@@ -0,0 +1,53 @@
+"""shards.shard_for() against a linear walk of the hash ring.
+
+Routing must match the plain definition of consistent hashing (the first
+ring point after the key's hash, wrapping around) and move only the
+products the new worker takes when the worker count grows.
+Run with `python -m pytest tests`.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shards  # noqa: E402
+
+KEYS = [f"product-{i}" for i in range(20000)]
+
+def linear_shard_for(product_key, count):
+    if count <= 1:
+        return 0
+    points = sorted(
+        (shards.ring_hash(f"shard-{shard}-{replica}"), shard)
+        for shard in range(count)
+        for replica in range(shards.VIRTUAL_NODES)
+    )
+    value = shards.ring_hash(product_key)
+    for point, shard in points:
+        if point > value:
+            return shard
+    return points[0][1]
+
+def test_matches_linear_ring_walk():
+    for count in (1, 2, 3, 5, 8):
+        for key in KEYS[:300]:
+            assert shards.shard_for(key, count) == linear_shard_for(key, count), (key, count)
+
+def test_growing_only_moves_products_to_the_new_worker():
+    for count in (2, 3, 4, 7):
+        moved = 0
+        for key in KEYS:
+            before, after = shards.shard_for(key, count), shards.shard_for(key, count + 1)
+            if before != after:
+                assert after == count, key
+                moved += 1
+        # About 1/(N+1) of the products move
+        assert abs(moved / len(KEYS) - 1 / (count + 1)) < 0.1, (count, moved)
+
+def test_every_worker_gets_a_fair_share():
+    for count in (2, 4, 8):
+        loads = [0] * count
+        for key in KEYS:
+            loads[shards.shard_for(key, count)] += 1
+        assert min(loads) > len(KEYS) / count * 0.5, (count, loads)
+        assert max(loads) < len(KEYS) / count * 1.6, (count, loads)
@@ -0,0 +1,92 @@
+"""subscriptions.resolve() against brute-force fnmatch over every subscription.
+
+The exact-flavor buckets and the trigram-keyed pattern index must never
+change who gets an alert. Run with `python -m pytest tests`.
+"""
+import os
+import sys
+import random
+import fnmatch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import subscriptions  # noqa: E402
+
+FLAVORS = ["Mint", "Grape Ice", "Blue Razz Ice", "Strawberry Banana", "Mango Peach", "Watermelon Ice",
+           "Cool Mint", "Peach [Limited]", "Ice*Cream", "Pineapple Coconut", "B-Pop", "Lemon?"]
+
+PATTERNS = ["*ice*", "*mint", "mint*", "*berry*", "m?ngo*", "*[lb]lue*", "grape*", "*peach*",
+            "*[!a-z]*", "*a*", "*", "?", "[ms]*", "*pop", "*[*]*", "*ic[e]", "peach [l*", "lemon[?]",
+            "*coco*nut", "blue razz ic?", "*melon ice", "[!m]*", "*ice?cream", "x*", "*[]]*"]
+
+SCOPES = [("product", "p1"), ("product", "p2"), ("site", "vaporhatch"), ("site", "drsmoke"), ("all", "")]
+
+def reset():
+    for index in (subscriptions.SUBSCRIPTIONS, subscriptions.BY_TARGET, subscriptions.ANY_FLAVOR,
+                  subscriptions.EXACT_FLAVOR, subscriptions.FLAVOR_PATTERNS, subscriptions.PATTERN_KEYS):
+        index.clear()
+    # The index is filled by hand, never from the database
+    subscriptions._loaded = True
+
+def subscribe_randomly(rng, count):
+    reset()
+    for sub_id in range(1, count + 1):
+        kind = rng.random()
+        if kind < 0.15:
+            flavor = ""
+        elif kind < 0.5:
+            flavor = rng.choice(FLAVORS)
+            flavor = flavor.upper() if rng.random() < 0.2 else flavor
+        else:
+            flavor = rng.choice(PATTERNS)
+        target = (rng.choice(["channel", "user"]), rng.randrange(40))
+        subscriptions.index_subscription(sub_id, target, rng.choice(SCOPES), flavor)
+
+def brute_force_resolve(product_key, site, flavors):
+    scopes = {("product", product_key), ("site", site), ("all", "")}
+    recipients = {}
+    for target, scope, wanted in subscriptions.SUBSCRIPTIONS.values():
+        if scope not in scopes:
+            continue
+        for flavor in flavors:
+            if not wanted or (fnmatch.fnmatchcase(flavor.lower(), wanted.lower())
+                              if subscriptions.is_pattern(wanted) else flavor.lower() == wanted.lower()):
+                recipients.setdefault(target, set()).add(flavor)
+    return recipients
+
+def assert_resolves_like_brute_force(rng):
+    for product_key in ("p1", "p2", "p3"):
+        for site in ("vaporhatch", "drsmoke"):
+            flavors = rng.sample(FLAVORS, rng.randint(1, 4))
+            assert subscriptions.resolve(product_key, site, flavors) == \
+                brute_force_resolve(product_key, site, flavors), (product_key, site, flavors)
+
+def test_resolve_matches_brute_force():
+    rng = random.Random(1)
+    for count in (10, 300, 3000):
+        subscribe_randomly(rng, count)
+        for _ in range(20):
+            assert_resolves_like_brute_force(rng)
+
+def test_every_flavor_a_pattern_matches_contains_its_key():
+    for pattern in PATTERNS:
+        key = subscriptions.pattern_key(pattern)
+        for flavor in FLAVORS:
+            lowered = flavor.lower()
+            if fnmatch.fnmatchcase(lowered, pattern):
+                assert key in subscriptions.flavor_keys(lowered), (pattern, flavor)
+
+def test_resolve_after_unsubscribing():
+    rng = random.Random(2)
+    subscribe_randomly(rng, 1500)
+    for sub_id in rng.sample(sorted(subscriptions.SUBSCRIPTIONS), 1000):
+        subscriptions.unindex_subscription(sub_id)
+    for _ in range(20):
+        assert_resolves_like_brute_force(rng)
+
+    # Nothing left behind for patterns no subscription uses any more
+    used = {(scope, flavor.lower()) for _, scope, flavor in subscriptions.SUBSCRIPTIONS.values()
+            if subscriptions.is_pattern(flavor)}
+    assert set(subscriptions.FLAVOR_PATTERNS) == used
+    indexed = {(scope, pattern) for (scope, _), patterns in subscriptions.PATTERN_KEYS.items() for pattern in patterns}
+    assert indexed == used
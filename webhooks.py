@@ -0,0 +1,100 @@
+import os
+import re
+import time
+import asyncio
+import aiohttp
+import fetcher
+import dispatch
+import metrics
+
+# ==========================
+# CONFIG
+# ==========================
+
+# Discord webhook URLs that receive every stock alert, comma separated
+ALERT_WEBHOOK_URLS = os.environ.get("ALERT_WEBHOOK_URLS", "")
+
+# Shown as the message author instead of the webhook's default name
+WEBHOOK_USERNAME = os.environ.get("WEBHOOK_USERNAME", "VaporHatch Stock")
+
+WEBHOOK_TIMEOUT = 15
+
+WEBHOOK_URL_PATTERN = re.compile(r"https://(?:\w+\.)?discord(?:app)?\.com/api/webhooks/(\d+)/[\w-]+")
+
+# ==========================
+# WEBHOOK SINK
+# ==========================
+
+class RateLimited(Exception):
+    """Discord answered 429; dispatch waits ``retry_after`` seconds before retrying"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# webhook id -> URL; targets are ("webhook", id) so the token never shows up in logs
+WEBHOOKS = {}
+
+# webhook id -> monotonic time its rate-limit bucket refills, when Discord said it is empty
+BUCKET_RESETS = {}
+
+def add_webhook(url):
+    """Register a webhook URL and return its alert target (None for a malformed URL)"""
+    match = WEBHOOK_URL_PATTERN.match(url.strip())
+    if not match:
+        print("Ignoring malformed webhook URL (expected https://discord.com/api/webhooks/<id>/<token>)")
+        return None
+    WEBHOOKS[match.group(1)] = match.group(0)
+    return ("webhook", match.group(1))
+
+def load_webhooks(urls=ALERT_WEBHOOK_URLS):
+    """Targets for the configured webhooks, installing the sender when there are any"""
+    if isinstance(urls, str):
+        urls = urls.split(",")
+    targets = [target for target in (add_webhook(url) for url in urls if url.strip()) if target]
+    if targets:
+        dispatch.set_sender(send_webhook, "webhook")
+    return targets
+
+def remember_bucket(webhook_id, headers):
+    """Hold further posts until the bucket refills once Discord says it is empty"""
+    if headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            BUCKET_RESETS[webhook_id] = time.monotonic() + float(headers.get("X-RateLimit-Reset-After", "1"))
+        except ValueError:
+            pass
+
+async def send_webhook(target, text):
+    """Post one message to a webhook through the pooled Discord session"""
+    webhook_id = target[1]
+    url = WEBHOOKS.get(webhook_id)
+    if url is None:
+        raise dispatch.PermanentSendError(f"unknown webhook {webhook_id}")
+
+    wait = BUCKET_RESETS.pop(webhook_id, 0) - time.monotonic()
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+    payload = {
+        "content": text,
+        "username": WEBHOOK_USERNAME,
+        # Flavor names are never meant to ping anyone
+        "allowed_mentions": {"parse": []},
+    }
+    session = fetcher.get_session(url)
+    host = fetcher.get_host(url)
+    async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT)) as r:
+        metrics.inc("requests_total", host=host, status=str(r.status))
+        remember_bucket(webhook_id, r.headers)
+        if r.status == 429:
+            retry_after = r.headers.get("Retry-After")
+            try:
+                body = await r.json(content_type=None)
+                retry_after = body.get("retry_after", retry_after)
+            except Exception:
+                pass
+            raise RateLimited(f"webhook {webhook_id} rate limited", float(retry_after or 1))
+        if r.status in (401, 403, 404):
+            # Deleted webhook or revoked token: retrying can't help
+            raise dispatch.PermanentSendError(f"webhook {webhook_id} answered {r.status}")
+        r.raise_for_status()